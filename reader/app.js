@@ -15,6 +15,7 @@
   const readingProgress = document.getElementById('reading-progress');
 
   let allDocs = [];
+  let sidebarData = [];
   let searchTimeout = null;
   let config = null;
 
@@ -22,6 +23,14 @@
   const renderedCache = new Map(); // path -> rendered_html
   const textPool = new Map();      // path -> raw_text
   const prefetchDebounce = new Map(); // path -> timeout_id
+  const navShards = new Map();        // folder id -> Promise<children>
+  const navStubs = new Map();         // folder element id -> { item, depth }
+  const docVersions = new Map();      // path -> content hash from the nav index
+  const docOutlines = new Map();      // path -> outline sidecar hash from the nav index
+  const docTables = new Map();        // path -> table sidecar hash from the nav index
+  let tablesRequest = null;           // { path, data } for the current document's table sidecar
+  let segmentLoader = null;           // loads the remaining segments of the current document on demand
+  let currentPath = null;
 
   const md = window.markdownit({
     html: true,
@@ -40,7 +49,7 @@
   });
 
   function loadConfig() {
-    return fetch('config.json?t=' + Date.now())
+    return fetch('config.json', { cache: 'no-cache' })
       .then(r => r.json())
       .then(cfg => {
         config = cfg;
@@ -92,15 +101,36 @@
     return result;
   }
 
+  // Versioned URLs can be cached indefinitely; without a known hash revalidate with the server
+  function fetchDoc(path) {
+    let key = path;
+    try { key = decodeURIComponent(path); } catch (e) { }
+    const version = docVersions.get(key);
+    return version ? fetch(`docs/${path}?v=${version}`) : fetch(`docs/${path}`, { cache: 'no-cache' });
+  }
+
+  function registerDocs(docs) {
+    const known = new Set(allDocs.map(doc => doc.path));
+    docs.forEach(doc => {
+      if (doc.v) docVersions.set(doc.path, doc.v);
+      if (doc.o) docOutlines.set(doc.path, doc.o);
+      if (doc.t) docTables.set(doc.path, doc.t);
+      if (!known.has(doc.path)) allDocs.push(doc);
+    });
+  }
+
   function loadSidebar() {
-    fetch('index.json')
+    fetch('index.json', { cache: 'no-cache' })
       .then(r => {
         if (!r.ok) throw new Error('索引文件不存在');
         return r.json();
       })
       .then(data => {
-        allDocs = flattenDocs(data);
-        renderSidebar(data);
+        // Legacy index.json is the full tree; the sharded format only lists top-level folder stubs
+        sidebarData = Array.isArray(data) ? data : data.items;
+        registerDocs(flattenDocs(sidebarData));
+        renderSidebar(sidebarData);
+        loadAllDocTitles();
       })
       .catch(err => {
         console.log('[App] ' + err.message);
@@ -108,26 +138,88 @@
       });
   }
 
+  // Title search needs every document; with a sharded index use the search doc table if it exists
+  function loadAllDocTitles() {
+    loadSearchMeta()
+      .then(meta => meta ? loadSearchDocs(meta) : null)
+      .then(docs => {
+        if (!docs) return;
+        const known = new Set(allDocs.map(doc => doc.path));
+        docs.forEach(doc => {
+          if (doc && !known.has(doc[0])) {
+            allDocs.push({ path: doc[0], title: doc[1], name: doc[0].split('/').pop() });
+          }
+        });
+      })
+      .catch(() => { });
+  }
+
+  function loadNavFolder(item) {
+    if (!navShards.has(item.id)) {
+      navShards.set(item.id, fetch(`nav/${item.id}.json?v=${item.hash}`)
+        .then(r => {
+          if (!r.ok) throw new Error('目录分片不存在: ' + item.id);
+          return r.json();
+        })
+        .then(children => {
+          registerDocs(flattenDocs(children));
+          return children;
+        })
+        .catch(err => {
+          navShards.delete(item.id);
+          throw err;
+        }));
+    }
+    return navShards.get(item.id);
+  }
+
+  function fillLazyFolder(list) {
+    const entry = navStubs.get(list.dataset.parent);
+    if (!entry || list.dataset.lazy !== 'true') return;
+    list.dataset.lazy = 'loading';
+    loadNavFolder(entry.item)
+      .then(children => {
+        list.innerHTML = children.map(child => renderSidebarItem(child, 0, entry.depth)).join('');
+        list.dataset.lazy = 'false';
+        expandLazyFolders(list);
+      })
+      .catch(err => {
+        console.log('[App] ' + err.message);
+        list.dataset.lazy = 'true';
+        list.innerHTML = '<li>加载失败</li>';
+      });
+  }
+
+  function expandLazyFolders(container) {
+    container.querySelectorAll('.folder-children[data-lazy="true"]').forEach(list => {
+      if (list.style.display !== 'none') fillLazyFolder(list);
+    });
+  }
+
   function renderSidebar(data, isRoot = true) {
     let html = '';
     data.forEach((item) => {
       html += renderSidebarItem(item, 0, 0);
     });
     sidebarList.innerHTML = html || '<li>暂无文档</li>';
-    attachFolderListeners();
+    expandLazyFolders(sidebarList);
   }
 
   function renderSidebarItem(item, index = 0, depth = 0) {
     if (item.type === 'folder') {
-      const totalFiles = countFiles(item.children || []);
+      const lazy = !item.children;
+      const totalFiles = lazy ? item.files : countFiles(item.children || []);
       const isCollapsed = totalFiles >= 4;
-      const folderId = `folder-${Date.now()}-${Math.random().toString(36).substr(2, 9)}`;
+      const folderId = lazy ? `nav-${item.id}` : `folder-${Date.now()}-${Math.random().toString(36).substr(2, 9)}`;
       const state = isCollapsed ? 'collapsed' : 'expanded';
       const arrow = isCollapsed ? '▶' : '▼';
       let html = `<li class="folder" data-folder-id="${folderId}" data-state="${state}">
         <span class="folder-name"><span class="folder-icon">📁</span>${escapeHtml(item.name)}<span class="folder-arrow">${arrow}</span></span>
       </li>`;
-      if (item.children && item.children.length > 0) {
+      if (lazy) {
+        navStubs.set(folderId, { item, depth: depth + 1 });
+        html += `<ul class="folder-children" data-parent="${folderId}" data-lazy="true" style="display:${isCollapsed ? 'none' : 'block'}"></ul>`;
+      } else if (item.children && item.children.length > 0) {
         html += `<ul class="folder-children" data-parent="${folderId}" style="display:${isCollapsed ? 'none' : 'block'}">`;
         item.children.forEach((child) => {
           html += renderSidebarItem(child, 0, depth + 1);
@@ -152,8 +244,7 @@
     if (prefetchDebounce.has(path)) clearTimeout(prefetchDebounce.get(path));
 
     const timeoutId = setTimeout(() => {
-      const url = `docs/${path}`;
-      fetch(url)
+      fetchDoc(path)
         .then(r => r.ok ? r.text() : null)
         .then(text => {
           if (text) {
@@ -167,21 +258,20 @@
     prefetchDebounce.set(path, timeoutId);
   };
 
-  function attachFolderListeners() {
-    document.querySelectorAll('.folder').forEach(folder => {
-      folder.addEventListener('click', (e) => {
-        if (e.target.closest('.sub-item')) return;
-        const folderId = folder.dataset.folderId;
-        const children = document.querySelector(`.folder-children[data-parent="${folderId}"]`);
-        if (children) {
-          const isCollapsed = children.style.display === 'none';
-          children.style.display = isCollapsed ? 'block' : 'none';
-          folder.dataset.state = isCollapsed ? 'expanded' : 'collapsed';
-          folder.querySelector('.folder-arrow').textContent = isCollapsed ? '▼' : '▶';
-        }
-      });
-    });
-  }
+  // Delegated so folders rendered later (lazy shards, search resets) need no extra listeners
+  sidebarList.addEventListener('click', (e) => {
+    const folder = e.target.closest('.folder');
+    if (!folder || e.target.closest('.sub-item')) return;
+    const folderId = folder.dataset.folderId;
+    const children = document.querySelector(`.folder-children[data-parent="${folderId}"]`);
+    if (children) {
+      const isCollapsed = children.style.display === 'none';
+      children.style.display = isCollapsed ? 'block' : 'none';
+      folder.dataset.state = isCollapsed ? 'expanded' : 'collapsed';
+      folder.querySelector('.folder-arrow').textContent = isCollapsed ? '▼' : '▶';
+      if (isCollapsed) fillLazyFolder(children);
+    }
+  });
 
   function renderSearchResults(results) {
     if (results.length === 0) {
@@ -195,11 +285,106 @@
     sidebarList.innerHTML = html;
   }
 
+  // Full-text search over the build-time inverted index (search/index.json + shards)
+  const SEARCH_TOKEN_RE = /([\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af\uf900-\ufaff]+)|([0-9A-Za-z\u00c0-\u024f]+)/g;
+  const searchShards = new Map(); // shard -> Promise<postings>
+  let searchMeta = null;
+  let searchDocs = null;
+  let searchSeq = 0;
+
+  function loadSearchMeta() {
+    if (!searchMeta) {
+      searchMeta = fetch('search/index.json', { cache: 'no-cache' })
+        .then(r => r.ok ? r.json() : null)
+        .catch(() => null);
+    }
+    return searchMeta;
+  }
+
+  function loadSearchDocs(meta) {
+    if (!searchDocs) {
+      searchDocs = fetch(`search/docs.json?v=${meta.docs}`).then(r => r.json());
+    }
+    return searchDocs;
+  }
+
+  // Must match tokenize_text() in scripts/sync.py: CJK bigrams, lowercase Latin words
+  function tokenizeQuery(query, maxWordLength) {
+    const terms = new Set();
+    for (const match of query.matchAll(SEARCH_TOKEN_RE)) {
+      if (match[1]) {
+        const run = match[1];
+        if (run.length === 1) {
+          terms.add(run);
+        }
+        for (let i = 0; i < run.length - 1; i++) {
+          terms.add(run.slice(i, i + 2));
+        }
+      } else if (match[2].length >= 2 && match[2].length <= maxWordLength) {
+        terms.add(match[2].toLowerCase());
+      }
+    }
+    return [...terms];
+  }
+
+  // Must match get_search_shard() in scripts/sync.py
+  function searchShardKey(term, shift) {
+    const code = term.charCodeAt(0);
+    return code < 0x80 ? term[0] : 'u' + (code >> shift).toString(16);
+  }
+
+  function loadSearchShard(meta, shard) {
+    if (!(shard in meta.shards)) return Promise.resolve({});
+    if (!searchShards.has(shard)) {
+      searchShards.set(shard, fetch(`search/${shard}.json?v=${meta.shards[shard]}`)
+        .then(r => r.ok ? r.json() : {})
+        .catch(() => {
+          searchShards.delete(shard);
+          return {};
+        }));
+    }
+    return searchShards.get(shard);
+  }
+
+  function fullTextSearch(query) {
+    return loadSearchMeta().then(meta => {
+      if (!meta) return [];
+      const terms = tokenizeQuery(query, meta.max_word_length);
+      if (terms.length === 0) return [];
+
+      const postingLists = terms.map(term =>
+        loadSearchShard(meta, searchShardKey(term, meta.shift)).then(postings => postings[term] || null));
+      return Promise.all([loadSearchDocs(meta), ...postingLists]).then(([docs, ...lists]) => {
+        if (lists.some(list => !list)) return [];
+        // Documents containing every term, ranked by total term frequency
+        let scores = null;
+        for (const list of lists) {
+          const next = new Map();
+          for (let i = 0; i < list.length; i += 2) {
+            const id = list[i];
+            if (scores === null) {
+              next.set(id, list[i + 1]);
+            } else if (scores.has(id)) {
+              next.set(id, scores.get(id) + list[i + 1]);
+            }
+          }
+          scores = next;
+        }
+        return [...scores.entries()]
+          .sort((a, b) => b[1] - a[1])
+          .filter(([id]) => docs[id])
+          .map(([id]) => ({ path: docs[id][0], title: docs[id][1] }));
+      });
+    }).catch(err => {
+      console.log('[Search] 全文搜索失败: ' + err.message);
+      return [];
+    });
+  }
+
   function handleSearch(query) {
+    const seq = ++searchSeq;
     if (!query.trim()) {
-      fetch('index.json')
-        .then(r => r.json())
-        .then(data => renderSidebar(data));
+      renderSidebar(sidebarData);
       return;
     }
 
@@ -210,6 +395,13 @@
       doc.path.toLowerCase().includes(lowerQuery)
     );
     renderSearchResults(results);
+
+    // Title matches first, then documents whose content matches
+    fullTextSearch(query).then(contentResults => {
+      if (seq !== searchSeq || contentResults.length === 0) return;
+      const seen = new Set(results.map(doc => doc.path));
+      renderSearchResults(results.concat(contentResults.filter(doc => !seen.has(doc.path))));
+    });
   }
 
   searchInput.addEventListener('input', (e) => {
@@ -353,11 +545,21 @@
     }
   }
 
-  window.loadDoc = function (path) {
+  // With prerender_txt the build emits .html for .txt sources; keep old .txt links and home_page working
+  function resolveDocPath(path) {
+    if (config && config.prerender_txt && path.endsWith('.txt')) {
+      return path.slice(0, -4) + '.html';
+    }
+    return path;
+  }
+
+  window.loadDoc = function (path, anchor) {
+    path = resolveDocPath(path);
+
     // 1. Check Rendered Cache (Fastest)
     if (renderedCache.has(path)) {
       console.log('[Cache] Rendered hit:', path);
-      applyContent(renderedCache.get(path), path);
+      applyContent(renderedCache.get(path), path, anchor);
       return;
     }
 
@@ -368,13 +570,12 @@
       const content = textPool.get(path);
       const rendered = isHtml ? content : renderContent(content);
       renderedCache.set(path, rendered);
-      applyContent(rendered, path);
+      applyContent(rendered, path, anchor);
       return;
     }
 
     // 3. Network Fetch
-    const url = `docs/${path}`;
-    fetch(url)
+    fetchDoc(path)
       .then(r => {
         if (!r.ok) throw new Error('文件不存在: ' + path);
         return r.text();
@@ -383,7 +584,7 @@
         const isHtml = path.endsWith('.html');
         const rendered = isHtml ? content : renderContent(content);
         renderedCache.set(path, rendered);
-        applyContent(rendered, path);
+        applyContent(rendered, path, anchor);
       })
       .catch(err => {
         console.log('[App] ' + err.message);
@@ -391,18 +592,26 @@
       });
   };
 
-  function applyContent(rendered, path) {
+  function applyContent(rendered, path, anchor) {
     viewer.classList.remove('switching');
     void viewer.offsetWidth; // Force reflow
 
     viewer.innerHTML = rendered;
     viewer.classList.add('switching');
+    currentPath = path;
+    loadSegments(path);
+    loadTables(path);
+    const outline = loadOutline(path);
 
     viewer.style.opacity = '';
     viewer.style.transform = '';
 
-    window.location.hash = path;
-    window.scrollTo({ top: 0, behavior: 'smooth' });
+    window.location.hash = anchor ? `${path}#${anchor}` : path;
+    if (anchor) {
+      jumpToSection(anchor, outline);
+    } else {
+      window.scrollTo({ top: 0, behavior: 'smooth' });
+    }
 
     if (isMobile()) {
       // Small delay to ensure click event doesn't re-trigger open
@@ -415,6 +624,225 @@
     setTimeout(enhanceCodeBlocks, 100);
   }
 
+  // Large pre-rendered documents end with a marker pointing at their segment manifest;
+  // the remaining segments are fetched one at a time as the marker approaches the viewport
+  function loadSegments(path) {
+    segmentLoader = null;
+    const marker = viewer.querySelector('.doc-segments');
+    if (!marker) return;
+    const docDir = path.includes('/') ? path.slice(0, path.lastIndexOf('/') + 1) : '';
+    const manifestPath = marker.dataset.manifest;
+    const segmentDir = `docs/${docDir}${manifestPath.slice(0, manifestPath.split('?')[0].lastIndexOf('/') + 1)}`;
+
+    const manifestRequest = fetch(`docs/${docDir}${manifestPath}`)
+      .then(r => {
+        if (!r.ok) throw new Error('分段清单不存在: ' + manifestPath);
+        return r.json();
+      });
+
+    // Segments are appended strictly in order; `pending` chains every request behind the previous one
+    let next = 0;
+    let pending = Promise.resolve();
+    const loadNext = manifest => {
+      pending = pending.then(() => {
+        if (!marker.isConnected || next >= manifest.segments.length) return false;
+        const segment = manifest.segments[next++];
+        return fetch(`${segmentDir}${segment.file}?v=${segment.hash}`)
+          .then(r => {
+            if (!r.ok) throw new Error('分段不存在: ' + segment.file);
+            return r.text();
+          })
+          .then(html => {
+            if (!marker.isConnected) return false;
+            marker.insertAdjacentHTML('beforebegin', html);
+            enhanceCodeBlocks();
+            loadTables(path);
+            if (next >= manifest.segments.length) marker.remove();
+            return true;
+          })
+          .catch(err => {
+            console.log('[Segments] ' + err.message);
+            return false;
+          });
+      });
+      return pending;
+    };
+
+    // Section jumps load every segment up to the one holding the heading (segment 0 is the page itself)
+    const loader = {
+      loadUntil: index => manifestRequest.then(manifest => {
+        const step = () => (next < index && next < manifest.segments.length)
+          ? loadNext(manifest).then(loaded => loaded && step())
+          : Promise.resolve();
+        return step();
+      })
+    };
+    segmentLoader = loader;
+
+    manifestRequest
+      .then(manifest => {
+        let loading = false;
+        const observer = new IntersectionObserver(entries => {
+          if (loading || !entries.some(entry => entry.isIntersecting)) return;
+          if (!marker.isConnected || next >= manifest.segments.length) {
+            observer.disconnect();
+            marker.remove();
+            return;
+          }
+          loading = true;
+          loadNext(manifest).finally(() => {
+            loading = false;
+            // Re-observing reports the current intersection, so loading continues while the marker stays near view
+            if (!marker.isConnected) return observer.disconnect();
+            observer.unobserve(marker);
+            observer.observe(marker);
+          });
+        }, { rootMargin: '2000px 0px' });
+        observer.observe(marker);
+      })
+      .catch(err => console.log('[Segments] ' + err.message));
+  }
+
+  // The build writes <doc>.outline.json next to documents that have headings: [level, text, anchor, segment]
+  function loadOutline(path) {
+    const version = docOutlines.get(path);
+    if (!version) return Promise.resolve(null);
+    const outlinePath = path.replace(/\.[^./]+$/, '') + '.outline.json';
+    return fetch(`docs/${outlinePath}?v=${version}`)
+      .then(r => {
+        if (!r.ok) throw new Error('大纲不存在: ' + outlinePath);
+        return r.json();
+      })
+      .then(outline => {
+        if (currentPath === path && outline.headings.length > 1) renderOutline(outline, path);
+        return outline;
+      })
+      .catch(err => {
+        console.log('[Outline] ' + err.message);
+        return null;
+      });
+  }
+
+  function renderOutline(outline, path) {
+    // applyContent can run twice for one navigation (hash update); keep a single outline
+    if (viewer.querySelector('.doc-outline')) return;
+    const items = outline.headings.map(([level, text, anchor]) =>
+      `<li class="outline-${level}"><a href="#${escapeHtml(path)}#${escapeHtml(anchor)}" data-anchor="${escapeHtml(anchor)}">${escapeHtml(text)}</a></li>`);
+    viewer.insertAdjacentHTML('afterbegin',
+      `<details class="doc-outline"><summary>目录</summary><ul>${items.join('')}</ul></details>`);
+    viewer.querySelector('.doc-outline').addEventListener('click', e => {
+      const link = e.target.closest('a[data-anchor]');
+      if (!link) return;
+      e.preventDefault();
+      // replaceState keeps the deep link without firing hashchange (which would reload the document)
+      history.replaceState(null, '', `#${path}#${link.dataset.anchor}`);
+      jumpToSection(link.dataset.anchor, Promise.resolve(outline));
+    });
+  }
+
+  function jumpToSection(anchor, outline) {
+    const scroll = () => {
+      const target = document.getElementById(anchor);
+      if (target) target.scrollIntoView({ behavior: 'smooth' });
+      return !!target;
+    };
+    if (scroll() || !outline) return;
+    // The heading lives in a segment that has not been loaded yet
+    outline.then(data => {
+      const entry = data && data.headings.find(heading => heading[2] === anchor);
+      if (!entry || !segmentLoader) return;
+      segmentLoader.loadUntil(entry[3]).then(scroll);
+    });
+  }
+
+  // Tables with at least table_virtual_rows body rows are built with only their first rows and a spacer;
+  // the full body is in <doc>.tables.json (one array per column) and only rows near the viewport are kept in the DOM
+  function loadTables(path) {
+    const tables = viewer.querySelectorAll('table[data-table]:not([data-virtual])');
+    if (!tables.length) return;
+    if (!tablesRequest || tablesRequest.path !== path) {
+      const version = docTables.get(path);
+      const tablesPath = path.replace(/\.[^./]+$/, '') + '.tables.json';
+      const request = version ? fetch(`docs/${tablesPath}?v=${version}`) : fetch(`docs/${tablesPath}`, { cache: 'no-cache' });
+      tablesRequest = {
+        path,
+        data: request.then(r => {
+          if (!r.ok) throw new Error('表格数据不存在: ' + tablesPath);
+          return r.json();
+        })
+      };
+    }
+    tables.forEach(table => { table.dataset.virtual = 'pending'; });
+    tablesRequest.data
+      .then(data => tables.forEach(table => {
+        const entry = data.tables[Number(table.dataset.table)];
+        if (entry && table.isConnected) virtualizeTable(table, entry);
+      }))
+      .catch(err => console.log('[Tables] ' + err.message));
+  }
+
+  function virtualizeTable(table, entry) {
+    const columns = entry.columns;
+    const rowCount = columns.length ? columns[0].length : 0;
+    const tbody = table.tBodies[0];
+    if (!tbody || !tbody.rows.length || !rowCount) return;
+    // Cells never wrap in virtual tables, so every row has the height of the first preview row
+    const rowHeight = tbody.rows[0].getBoundingClientRect().height || 46;
+    const overscan = 20;
+    let start = -1, end = -1, frame = 0;
+
+    const spacer = rows => {
+      const tr = document.createElement('tr');
+      tr.className = 'table-spacer';
+      const td = tr.insertCell();
+      td.colSpan = columns.length;
+      td.style.height = `${rows * rowHeight}px`;
+      return tr;
+    };
+
+    const render = () => {
+      frame = 0;
+      if (!table.isConnected) {
+        window.removeEventListener('scroll', schedule);
+        window.removeEventListener('resize', schedule);
+        return;
+      }
+      const top = tbody.getBoundingClientRect().top;
+      let first = Math.min(rowCount, Math.max(0, Math.floor(-top / rowHeight) - overscan));
+      // The top spacer shifts every row by one; starting on an odd row keeps tr:nth-child(2n) striping in place
+      if (first > 0 && first % 2 === 0) first -= 1;
+      const last = Math.max(first, Math.min(rowCount, Math.ceil((window.innerHeight - top) / rowHeight) + overscan));
+      if (first === start && last === end) return;
+      start = first;
+      end = last;
+
+      const fragment = document.createDocumentFragment();
+      if (first > 0) fragment.appendChild(spacer(first));
+      for (let row = first; row < last; row++) {
+        const tr = document.createElement('tr');
+        columns.forEach((column, index) => {
+          const value = column[row];
+          if (value === null) return;
+          const td = tr.insertCell();
+          td.textContent = value;
+          td.title = value;
+          if (entry.align[index]) td.style.textAlign = entry.align[index];
+        });
+        fragment.appendChild(tr);
+      }
+      if (last < rowCount) fragment.appendChild(spacer(rowCount - last));
+      tbody.replaceChildren(fragment);
+    };
+    const schedule = () => {
+      if (!frame) frame = requestAnimationFrame(render);
+    };
+
+    table.dataset.virtual = 'true';
+    window.addEventListener('scroll', schedule, { passive: true });
+    window.addEventListener('resize', schedule);
+    render();
+  }
+
   function enhanceCodeBlocks() {
     // 0. Render Mermaid diagrams first
     document.querySelectorAll('.content pre code.language-mermaid, .content pre code[class*="language-mermaid"]').forEach((codeBlock) => {
@@ -516,11 +944,19 @@
     return div.innerHTML;
   }
 
+  // Deep links are #<path>#<anchor>; the anchor part is optional
   function handleHash() {
     const hash = window.location.hash.slice(1);
     console.log('[Hash] hash:', hash, ', config:', config, ', home_page:', config ? config.home_page : null);
     if (hash) {
-      window.loadDoc(hash);
+      const split = hash.indexOf('#');
+      if (split < 0) {
+        window.loadDoc(hash);
+        return;
+      }
+      let anchor = hash.slice(split + 1);
+      try { anchor = decodeURIComponent(anchor); } catch (e) { }
+      window.loadDoc(hash.slice(0, split), anchor);
     } else if (config && config.home_page) {
       console.log('[Hash] 加载首页:', config.home_page);
       window.loadDoc(config.home_page);
@@ -0,0 +1,460 @@
+#!/usr/bin/env python3
+"""
+同步脚本性能基准
+功能：校验 Markdown 渲染输出与黄金摘要一致，并测量渲染吞吐量(MB/s)；
+      --suite 生成合成语料，分阶段测量同步流程耗时并与基线对比；
+      --check-recovery 在转换中途杀死一个工作进程，检查构建仍然完整
+"""
+
+import io
+import sys
+import json
+import math
+import time
+import random
+import shutil
+import zipfile
+import argparse
+import platform
+import tempfile
+import importlib
+import contextlib
+from pathlib import Path
+from xml.sax.saxutils import escape
+
+sys.path.insert(0, str(Path(__file__).parent))
+import sync  # noqa: E402
+
+ROOT_DIR = Path(__file__).parent.parent
+GOLDEN_FILE = Path(__file__).parent / 'render-golden.json'
+BASELINE_FILE = Path(__file__).parent / 'bench-baseline.json'
+RESULTS_VERSION = 1
+
+LATIN_WORDS = ('sync', 'reader', 'index', 'render', 'table', 'cache', 'build', 'stage', 'document', 'search',
+               'markdown', 'value', 'config', 'deploy', 'server', 'client', 'folder', 'stream', 'hash', 'shard')
+CJK_CHARS = '文档阅读器同步脚本索引渲染表格缓存构建阶段搜索配置部署服务客户端目录文件内容标题段落列表代码性能测试数据结构'
+
+DOCX_CONTENT_TYPES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+    '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+    '<Default Extension="xml" ContentType="application/xml"/>'
+    '<Override PartName="/word/document.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.wordprocessingml.document.main+xml"/>'
+    '</Types>')
+DOCX_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+    'Target="word/document.xml"/>'
+    '</Relationships>')
+
+def log(msg):
+    print(f'[Bench] {msg}')
+
+def load_corpus(source_dir):
+    corpus = []
+    for path in sorted(Path(source_dir).rglob('*')):
+        if path.is_file() and path.suffix in ('.txt', '.md'):
+            rel_key = str(path.relative_to(source_dir)).replace('\\', '/')
+            corpus.append((rel_key, path.read_text(encoding='utf-8')))
+    return corpus
+
+def render_digests(corpus):
+    return {rel_key: sync.hash_bytes(sync.convert_markdown(text).encode('utf-8')) for rel_key, text in corpus}
+
+def check_golden(corpus, update=False):
+    """对比每个文档渲染结果的 SHA-256 与黄金摘要"""
+    digests = render_digests(corpus)
+    if update or not GOLDEN_FILE.exists():
+        with open(GOLDEN_FILE, 'w', encoding='utf-8') as f:
+            json.dump(digests, f, ensure_ascii=False, indent=2, sort_keys=True)
+        log(f'黄金摘要已写入: {GOLDEN_FILE} ({len(digests)} 个文档)')
+        return True
+
+    with open(GOLDEN_FILE, 'r', encoding='utf-8') as f:
+        golden = json.load(f)
+    failed = sorted(k for k in golden.keys() | digests.keys() if golden.get(k) != digests.get(k))
+    for rel_key in failed:
+        log(f'[ERROR] 渲染输出与黄金摘要不一致: {rel_key}')
+    if failed:
+        return False
+    log(f'黄金摘要校验通过: {len(digests)} 个文档')
+    return True
+
+def measure_render(corpus, min_seconds=1.0):
+    """重复渲染整个语料直到累计耗时超过 min_seconds，返回 MB/s"""
+    total_bytes = sum(len(text.encode('utf-8')) for _, text in corpus)
+    rounds = 0
+    start = time.perf_counter()
+    while True:
+        for _, text in corpus:
+            sync.convert_markdown(text)
+        rounds += 1
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_seconds:
+            break
+    return total_bytes * rounds / elapsed / (1024 * 1024), rounds, total_bytes
+
+def make_sentence(rng, cjk_ratio):
+    if rng.random() < cjk_ratio:
+        return ''.join(rng.choice(CJK_CHARS) for _ in range(rng.randint(8, 30))) + '。'
+    return ' '.join(rng.choice(LATIN_WORDS) for _ in range(rng.randint(5, 15))).capitalize() + '.'
+
+def make_paragraph(rng, cjk_ratio, inline=False):
+    sentences = [make_sentence(rng, cjk_ratio) for _ in range(rng.randint(2, 5))]
+    if inline:
+        i = rng.randrange(len(sentences))
+        sentences[i] = rng.choice(('**{}**', '*{}*', '`{}`', '[{}](https://example.com/doc)')).format(sentences[i])
+    return ' '.join(sentences)
+
+def make_table(rng, cjk_ratio, rows):
+    cols = rng.randint(2, 6)
+    lines = ['| ' + ' | '.join(f'列{i}' for i in range(cols)) + ' |', '|' + '---|' * cols]
+    for _ in range(rows):
+        lines.append('| ' + ' | '.join(make_sentence(rng, cjk_ratio)[:12] for _ in range(cols)) + ' |')
+    return '\n'.join(lines)
+
+def make_markdown(rng, size, cjk_ratio):
+    # 覆盖渲染器的主要路径：标题、列表、引用、代码块、表格和带行内格式的段落
+    blocks = []
+    total = 0
+    while total < size:
+        kind = rng.random()
+        if kind < 0.1:
+            block = '#' * rng.randint(1, 4) + ' ' + make_sentence(rng, cjk_ratio)
+        elif kind < 0.2:
+            marker = rng.choice(('- ', '1. '))
+            block = '\n'.join(marker + make_paragraph(rng, cjk_ratio, True) for _ in range(rng.randint(2, 6)))
+        elif kind < 0.25:
+            block = '```python\n' + '\n'.join(f'value_{i} = "{make_sentence(rng, 0)}"' for i in range(rng.randint(2, 8))) + '\n```'
+        elif kind < 0.3:
+            block = make_table(rng, cjk_ratio, rng.randint(2, 20))
+        elif kind < 0.35:
+            block = '\n'.join('> ' + make_sentence(rng, cjk_ratio) for _ in range(rng.randint(1, 3)))
+        else:
+            block = make_paragraph(rng, cjk_ratio, rng.random() < 0.5)
+        blocks.append(block)
+        total += len(block.encode('utf-8')) + 2
+    return '\n\n'.join(blocks) + '\n'
+
+def make_text(rng, size, cjk_ratio):
+    paragraphs = []
+    total = 0
+    while total < size:
+        paragraph = make_paragraph(rng, cjk_ratio)
+        paragraphs.append(paragraph)
+        total += len(paragraph.encode('utf-8')) + 2
+    return '\n\n'.join(paragraphs) + '\n'
+
+def write_docx(path, paragraphs):
+    # 最小的 WordprocessingML 包，不依赖 python-docx；固定时间戳保证文件可复现
+    body = ''.join(f'<w:p><w:r><w:t xml:space="preserve">{escape(text)}</w:t></w:r></w:p>' for text in paragraphs)
+    document = ('<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                '<w:document xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main">'
+                f'<w:body>{body}</w:body></w:document>')
+    with zipfile.ZipFile(path, 'w', zipfile.ZIP_DEFLATED) as zf:
+        for name, data in (('[Content_Types].xml', DOCX_CONTENT_TYPES), ('_rels/.rels', DOCX_RELS),
+                           ('word/document.xml', document)):
+            zf.writestr(zipfile.ZipInfo(name, date_time=(1980, 1, 1, 0, 0, 0)), data)
+
+def generate_corpus(target_dir, params):
+    """按参数生成可复现的合成语料，返回文件数和总字节数"""
+    rng = random.Random(params['seed'])
+    dirs = [Path(target_dir)]
+    frontier = [Path(target_dir)]
+    for depth in range(params['depth']):
+        frontier = [parent / f'{depth + 1:02d}-目录{i:02d}' for parent in frontier for i in range(params['fanout'])]
+        dirs.extend(frontier)
+    for path in dirs:
+        path.mkdir(parents=True, exist_ok=True)
+    
+    weights = params['mix']
+    total_bytes = 0
+    for i in range(params['files']):
+        # 文件大小服从对数正态分布，中位数为 size_kb
+        size = min(int(params['size_kb'] * 1024 * math.exp(rng.gauss(0, params['size_sigma']))),
+                   params['max_size_kb'] * 1024)
+        suffix = rng.choices(('.md', '.txt', '.docx'), weights=weights)[0]
+        path = rng.choice(dirs) / f'{i:05d}-文档{i}{suffix}'
+        if suffix == '.md':
+            path.write_text(make_markdown(rng, size, params['cjk_ratio']), encoding='utf-8')
+        elif suffix == '.txt':
+            path.write_text(make_text(rng, size, params['cjk_ratio']), encoding='utf-8')
+        else:
+            write_docx(path, make_text(rng, size, params['cjk_ratio']).split('\n\n'))
+        total_bytes += path.stat().st_size
+    return params['files'], total_bytes
+
+def create_workspace(workspace, params):
+    """在独立目录中搭建 scripts/、reader/ 和语料，同步脚本的所有输出都写在该目录内"""
+    (workspace / 'scripts').mkdir(parents=True, exist_ok=True)
+    (workspace / 'reader').mkdir(parents=True, exist_ok=True)
+    shutil.copy2(Path(__file__).parent / 'sync.py', workspace / 'scripts' / 'sync_bench.py')
+    with open(workspace / 'reader' / 'config.json', 'w', encoding='utf-8') as f:
+        json.dump({'source_dir': 'txt', 'full_text_search': params['full_text_search']}, f)
+    return generate_corpus(workspace / 'txt', params)
+
+def load_workspace_module(workspace):
+    # 以独立模块名导入副本，路径均相对副本解析；放入 sys.path 以便进程池子进程导入
+    sys.path.insert(0, str(workspace / 'scripts'))
+    module = importlib.import_module('sync_bench')
+    module.CONFIG_FILE = workspace / 'reader' / 'config.json'
+    return module
+
+def reset_outputs(workspace):
+    for name in ('docs', 'nav', 'search', 'assets'):
+        shutil.rmtree(workspace / 'reader' / name, ignore_errors=True)
+    for path in (workspace / 'reader' / 'index.json', workspace / 'reader' / 'assets.json',
+                 workspace / '.sync-manifest.json', workspace / '.sync-search-cache.json'):
+        path.unlink(missing_ok=True)
+
+def time_stage(timings, name, func, *args):
+    # 各阶段的逐文件日志写入空设备，避免终端输出影响计时
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        result = func(*args)
+    elapsed = time.perf_counter() - start
+    timings[name] = min(timings.get(name, elapsed), elapsed)
+    return result
+
+def run_pipeline(module, workspace, jobs, timings, prefix):
+    """按 sync.main() 的顺序执行各阶段并分别计时"""
+    source_dir = workspace / 'txt'
+    docs_dir = module.get_docs_dir()
+    inventory = time_stage(timings, f'{prefix}.build_inventory', module.build_inventory, source_dir)
+    time_stage(timings, f'{prefix}.cleanup_orphaned_files', module.cleanup_orphaned_files, inventory, docs_dir)
+    children = time_stage(timings, f'{prefix}.scan_directory', module.scan_directory, inventory)
+    manifest, search_docs = time_stage(timings, f'{prefix}.copy_and_convert_files',
+                                       module.copy_and_convert_files, inventory, docs_dir, jobs)
+    time_stage(timings, f'{prefix}.prune_orphaned_assets', module.prune_orphaned_assets, manifest)
+    if search_docs is not None:
+        time_stage(timings, f'{prefix}.build_search_index',
+                   module.build_search_index, search_docs, module.get_search_dir())
+    items = [{'type': 'folder', 'name': 'txt', 'children': children}]
+    time_stage(timings, f'{prefix}.generate_index',
+               module.generate_index, items, workspace / 'reader' / 'index.json', module.get_nav_versions(manifest))
+    time_stage(timings, f'{prefix}.publish_assets', module.publish_assets, workspace / 'reader', jobs)
+
+def best_of(func, min_seconds):
+    best = None
+    start = time.perf_counter()
+    while best is None or time.perf_counter() - start < min_seconds:
+        t = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - t
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+def measure_micro(module, workspace, params, timings, min_seconds):
+    """convert_markdown 和 render_table 的单独计时，使用同一份合成语料和工作目录中的同步脚本副本"""
+    texts = [path.read_text(encoding='utf-8') for path in sorted((workspace / 'txt').rglob('*.md'))]
+    rng = random.Random(params['seed'])
+    tables = [make_table(rng, params['cjk_ratio'], rows).split('\n') for rows in (10, 100, 1000)]
+    timings['micro.convert_markdown'] = best_of(lambda: [module.convert_markdown(text) for text in texts], min_seconds)
+    timings['micro.render_table'] = best_of(lambda: [module.render_table(lines) for lines in tables], min_seconds)
+    return sum(len(text.encode('utf-8')) for text in texts)
+
+def check_baseline(results, baseline_file, tolerance, min_delta):
+    """任一阶段耗时超过基线 (1 + tolerance) 倍且差值超过 min_delta 秒即视为退化"""
+    with open(baseline_file, 'r', encoding='utf-8') as f:
+        baseline = json.load(f)
+    if baseline.get('corpus') != results['corpus'] or baseline.get('jobs') != results['jobs']:
+        log(f'[ERROR] 基线的语料参数或进程数与本次不同: {baseline_file}')
+        return False
+    regressions = 0
+    for name, seconds in results['stages'].items():
+        base = baseline.get('stages', {}).get(name)
+        if base is None:
+            continue
+        if seconds > base * (1 + tolerance) and seconds - base > min_delta:
+            log(f'[ERROR] 阶段退化: {name} {base:.4f}s → {seconds:.4f}s (+{(seconds / base - 1) * 100:.0f}%)')
+            regressions += 1
+    if regressions:
+        return False
+    log(f'基线对比通过: {len(results["stages"])} 个阶段 (容差 {tolerance * 100:.0f}%)')
+    return True
+
+def run_suite(args):
+    params = {
+        'seed': args.seed,
+        'files': args.files,
+        'depth': args.depth,
+        'fanout': args.fanout,
+        'size_kb': args.size_kb,
+        'size_sigma': args.size_sigma,
+        'max_size_kb': args.max_size_kb,
+        'cjk_ratio': args.cjk_ratio,
+        'mix': [float(x) for x in args.mix.split(':')],
+        'full_text_search': not args.no_search
+    }
+    if len(params['mix']) != 3:
+        log('[ERROR] --mix 格式应为 MD:TXT:DOCX，例如 6:3:1')
+        return 1
+    if params['mix'][2] > 0 and importlib.util.find_spec('mammoth') is None:
+        log('[ERROR] 语料包含 DOCX，请安装 mammoth 库: pip install mammoth，或使用 --mix 6:4:0')
+        return 1
+    
+    workspace = Path(args.workspace) if args.workspace else Path(tempfile.mkdtemp(prefix='sync-bench-'))
+    try:
+        files, total_bytes = create_workspace(workspace, params)
+        log(f'合成语料: {files} 个文件, {total_bytes / (1024 * 1024):.1f} MB ({workspace})')
+        module = load_workspace_module(workspace)
+        
+        timings = {}
+        for round_index in range(args.repeat):
+            reset_outputs(workspace)
+            run_pipeline(module, workspace, args.jobs, timings, 'cold')
+            run_pipeline(module, workspace, args.jobs, timings, 'warm')
+            log(f'第 {round_index + 1}/{args.repeat} 轮完成')
+        md_bytes = measure_micro(module, workspace, params, timings, args.min_seconds)
+    finally:
+        if not args.keep:
+            shutil.rmtree(workspace, ignore_errors=True)
+    
+    results = {
+        'version': RESULTS_VERSION,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'jobs': args.jobs,
+        'corpus': dict(params, bytes=total_bytes),
+        'stages': timings,
+        'throughput': {
+            'convert_markdown_mb_s': md_bytes / timings['micro.convert_markdown'] / (1024 * 1024)
+            if timings['micro.convert_markdown'] else None
+        }
+    }
+    for name, seconds in timings.items():
+        log(f'{name:<36} {seconds * 1000:10.1f} ms')
+    
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+        log(f'结果已写入: {args.output}')
+    
+    baseline_file = Path(args.baseline)
+    if args.update_baseline:
+        with open(baseline_file, 'w', encoding='utf-8') as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+        log(f'基线已写入: {baseline_file}')
+        return 0
+    if not baseline_file.exists():
+        log(f'未找到基线，跳过对比: {baseline_file} (使用 --update-baseline 生成)')
+        return 0
+    return 0 if check_baseline(results, baseline_file, args.tolerance, args.min_delta) else 1
+
+def check_recovery(jobs=2, files=40):
+    """
+    按流水线模式(Builder.build 的 changed 参数)定向同步时杀死一个转换工作进程：构建应正常完成，
+    所有文档都转换成功并写入清单；之后再杀死一个空闲的工作进程，下一次构建应重建进程池
+    """
+    workspace = Path(tempfile.mkdtemp(prefix='sync-recovery-'))
+    rng = random.Random(1)
+    source_dir = workspace / 'txt'
+    source_dir.mkdir()
+    config = {'source_dir': 'txt', 'precompress': False}
+    paths = [source_dir / f'{i:03d}.md' for i in range(files)]
+    
+    def write_corpus(round_index):
+        for path in paths:
+            path.write_text(f'# 第 {round_index} 轮\n\n' + make_markdown(rng, 64 * 1024, 0.6), encoding='utf-8')
+    
+    def changed_lines(builder, kill_after):
+        for i, path in enumerate(paths):
+            if i == kill_after:
+                next(iter(builder.executor._processes.values())).kill()
+            yield f'M\ttxt/{path.name}'
+    
+    def check_state(state, round_index):
+        if state is None:
+            log(f'[ERROR] 第 {round_index} 轮: 构建失败')
+            return False
+        converted = sum(1 for path in paths
+                        if state['manifest'].get(path.name, {}).get('source_hash') == sync.hash_file(path))
+        if converted != files:
+            log(f'[ERROR] 第 {round_index} 轮: 只有 {converted}/{files} 个文档转换成功')
+            return False
+        return True
+    
+    try:
+        with sync.Builder(jobs) as builder:
+            write_corpus(0)
+            with contextlib.redirect_stdout(io.StringIO()):
+                builder.build(config, workspace / 'reader')
+            
+            write_corpus(1)
+            output = io.StringIO()
+            with contextlib.redirect_stdout(output):
+                state = builder.build(config, workspace / 'reader', changed=changed_lines(builder, files // 4))
+            if not check_state(state, 1):
+                return False
+            if '转换进程异常退出' not in output.getvalue():
+                log('[ERROR] 第 1 轮: 杀死工作进程后没有触发重试')
+                return False
+            
+            next(iter(builder.executor._processes.values())).kill()
+            time.sleep(0.5)
+            write_corpus(2)
+            output = io.StringIO()
+            with contextlib.redirect_stdout(output):
+                state = builder.build(config, workspace / 'reader', changed=(f'M\ttxt/{path.name}' for path in paths))
+            if not check_state(state, 2):
+                return False
+            if '进程池已损坏' not in output.getvalue():
+                log('[ERROR] 第 2 轮: 没有重建已损坏的进程池')
+                return False
+    finally:
+        shutil.rmtree(workspace, ignore_errors=True)
+    log(f'工作进程崩溃恢复校验通过: {files} 个文档, {jobs} 个进程')
+    return True
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='同步脚本性能基准')
+    parser.add_argument('--source', default=None, help='语料目录（默认使用 config.json 中的 source_dir）')
+    parser.add_argument('--update-golden', action='store_true', help='用当前渲染结果重写黄金摘要')
+    parser.add_argument('--min-seconds', type=float, default=1.0, help='吞吐量测量的最短时长')
+    parser.add_argument('--check-recovery', action='store_true', help='转换中途杀死一个工作进程，检查构建仍然完整')
+    
+    suite = parser.add_argument_group('分阶段基准 (--suite)')
+    suite.add_argument('--suite', action='store_true', help='生成合成语料并分阶段测量同步流程')
+    suite.add_argument('--files', type=int, default=2000, help='文件数（默认 2000）')
+    suite.add_argument('--depth', type=int, default=3, help='目录深度（默认 3）')
+    suite.add_argument('--fanout', type=int, default=4, help='每层子目录数（默认 4）')
+    suite.add_argument('--size-kb', type=float, default=4.0, help='文件大小中位数 KB（默认 4）')
+    suite.add_argument('--size-sigma', type=float, default=1.0, help='文件大小对数正态分布的 sigma（默认 1.0）')
+    suite.add_argument('--max-size-kb', type=int, default=1024, help='单个文件大小上限 KB（默认 1024）')
+    suite.add_argument('--cjk-ratio', type=float, default=0.6, help='中文句子所占比例（默认 0.6）')
+    suite.add_argument('--mix', default='6:3:1', help='MD:TXT:DOCX 文件数量比例（默认 6:3:1）')
+    suite.add_argument('--no-search', action='store_true', help='不构建全文搜索索引')
+    suite.add_argument('--seed', type=int, default=1, help='随机种子（默认 1）')
+    suite.add_argument('-j', '--jobs', type=int, default=1, help='转换和压缩使用的进程/线程数（默认 1）')
+    suite.add_argument('--repeat', type=int, default=3, help='重复次数，每个阶段取最小耗时（默认 3）')
+    suite.add_argument('--output', default=None, help='结果 JSON 的输出路径')
+    suite.add_argument('--baseline', default=str(BASELINE_FILE), help='基线文件路径')
+    suite.add_argument('--update-baseline', action='store_true', help='用本次结果重写基线')
+    suite.add_argument('--tolerance', type=float, default=0.25, help='允许的相对退化比例（默认 0.25）')
+    suite.add_argument('--min-delta', type=float, default=0.005, help='低于该秒数的差异不计为退化（默认 0.005）')
+    suite.add_argument('--workspace', default=None, help='工作目录（默认使用临时目录）')
+    suite.add_argument('--keep', action='store_true', help='保留工作目录')
+    args = parser.parse_args(argv)
+    
+    if args.suite:
+        return run_suite(args)
+    if args.check_recovery:
+        return 0 if check_recovery() else 1
+
+    source_dir = Path(args.source) if args.source else ROOT_DIR / sync.get_source_dir()
+    corpus = load_corpus(source_dir)
+    if not corpus:
+        log(f'[ERROR] 语料为空: {source_dir}')
+        return 1
+
+    ok = check_golden(corpus, update=args.update_golden)
+
+    mb_per_second, rounds, total_bytes = measure_render(corpus, args.min_seconds)
+    log(f'渲染吞吐量: {mb_per_second:.2f} MB/s ({len(corpus)} 个文档, {total_bytes} 字节 x {rounds} 轮)')
+    return 0 if ok else 1
+
+if __name__ == '__main__':
+    sys.exit(main())
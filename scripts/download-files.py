@@ -5,14 +5,39 @@
 """
 
 import os
+import sys
 import json
+import time
+import queue
+import random
+import shutil
+import hashlib
+import tarfile
+import argparse
+import tempfile
+import threading
 import subprocess
+import http.client
+import urllib.parse
+import urllib.request
 from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
 
 REPO = os.environ.get('GITHUB_REPOSITORY', 'coolapijust/front-text')
 TOKEN = os.environ.get('GITHUB_TOKEN', '')
 BRANCH = os.environ.get('GITHUB_REF', 'refs/heads/main').replace('refs/heads/', '')
 WORKSPACE = Path(os.environ.get('GITHUB_WORKSPACE', '.'))
+API_URL = os.environ.get('GITHUB_API_URL', 'https://api.github.com').rstrip('/')
+STATE_FILE = Path(os.environ.get('DOWNLOAD_STATE_FILE', WORKSPACE / '.download-state.json'))
+STATE_VERSION = 1
+HASH_CHUNK_SIZE = 1024 * 1024
+
+DEFAULT_WORKERS = 8
+ARCHIVE_THRESHOLD = 200
+MAX_RETRIES = 5
+BACKOFF_BASE = 1.0
+MAX_RATE_LIMIT_WAIT = 900
+DEFAULT_QUEUE_SIZE = 64
 
 ALLOWED_EXTENSIONS = {'.txt', '.md', '.docx'}
 SKIP_DIRS = {'.git', '.github', 'node_modules', '__pycache__', 'reader', 'scripts'}
@@ -20,53 +45,326 @@ SKIP_DIRS = {'.git', '.github', 'node_modules', '__pycache__', 'reader', 'script
 def run_cmd(cmd, capture=True):
     result = subprocess.run(cmd, shell=True, capture_output=capture, text=capture)
     if capture and result.returncode != 0:
-        print(f'[Error] {cmd}: {result.stderr}')
+        log(f'[Error] {cmd}: {result.stderr}')
     return result
 
-def get_tree_filesRecursive(sha):
-    """获取指定 commit/tree 下所有文件"""
-    url = f'https://api.github.com/repos/{REPO}/git/trees/{sha}?recursive=1'
-    headers = {'Authorization': f'token {TOKEN}', 'Accept': 'application/vnd.github.v3+json'}
+_local = threading.local()
+_print_lock = threading.Lock()
+
+def log(msg):
+    """多线程下保证每条日志完整输出"""
+    with _print_lock:
+        print(msg, flush=True)
+
+def get_connection():
+    """每个线程复用一个 HTTP/1.1 keep-alive 连接，避免每个文件重新握手"""
+    conn = getattr(_local, 'conn', None)
+    if conn is None:
+        parsed = urllib.parse.urlsplit(API_URL)
+        if parsed.scheme == 'https':
+            conn = http.client.HTTPSConnection(parsed.netloc, timeout=60)
+        else:
+            conn = http.client.HTTPConnection(parsed.netloc, timeout=60)
+        _local.conn = conn
+    return conn
+
+def close_connection():
+    conn = getattr(_local, 'conn', None)
+    if conn is not None:
+        conn.close()
+        _local.conn = None
+
+def backoff_delay(attempt):
+    """指数退避，附加随机抖动避免并发请求同时重试"""
+    return BACKOFF_BASE * (2 ** attempt) + random.uniform(0, BACKOFF_BASE)
+
+def rate_limit_delay(resp, attempt):
+    """根据限流响应头计算等待时间；不需要重试时返回 None"""
+    retry_after = resp.getheader('Retry-After')
+    remaining = resp.getheader('X-RateLimit-Remaining')
+    if resp.status == 429 or (resp.status == 403 and (retry_after or remaining == '0')):
+        if retry_after and retry_after.isdigit():
+            return min(int(retry_after), MAX_RATE_LIMIT_WAIT)
+        reset = resp.getheader('X-RateLimit-Reset')
+        if remaining == '0' and reset and reset.isdigit():
+            return min(max(int(reset) - time.time(), 0) + 1, MAX_RATE_LIMIT_WAIT)
+        return backoff_delay(attempt)
+    if resp.status >= 500:
+        return backoff_delay(attempt)
+    return None
+
+def api_get(path, accept):
+    """GET 请求 API，连接错误、5xx 和限流时重试，返回响应体"""
+    url_path = urllib.parse.urlsplit(API_URL).path + path
+    headers = {'Accept': accept, 'User-Agent': 'front-text-sync'}
+    if TOKEN:
+        headers['Authorization'] = f'token {TOKEN}'
     
-    import urllib.request
-    req = urllib.request.Request(url, headers=headers)
-    with urllib.request.urlopen(req) as resp:
-        data = json.loads(resp.read().decode())
-        return data.get('tree', [])
-    return []
+    for attempt in range(MAX_RETRIES + 1):
+        conn = get_connection()
+        try:
+            conn.request('GET', url_path, headers=headers)
+            resp = conn.getresponse()
+            body = resp.read()
+        except (http.client.HTTPException, OSError) as e:
+            close_connection()
+            if attempt == MAX_RETRIES:
+                raise
+            delay = backoff_delay(attempt)
+            log(f'[Retry] {path}: {e}，{delay:.1f} 秒后重试')
+            time.sleep(delay)
+            continue
+        
+        if resp.status == 200:
+            return body
+        delay = rate_limit_delay(resp, attempt)
+        if delay is None or attempt == MAX_RETRIES:
+            raise RuntimeError(f'HTTP {resp.status} {resp.reason}: {path}')
+        log(f'[Retry] {path}: HTTP {resp.status}，{delay:.1f} 秒后重试')
+        time.sleep(delay)
+
+def get_tree_filesRecursive(sha):
+    """获取指定 commit/tree 下所有文件，返回 (文件列表, 是否被截断)"""
+    body = api_get(f'/repos/{REPO}/git/trees/{sha}?recursive=1', 'application/vnd.github.v3+json')
+    data = json.loads(body.decode())
+    return data.get('tree', []), data.get('truncated', False)
+
+def is_allowed(path):
+    """是否为需要下载的文件：不在跳过目录中，且扩展名受支持"""
+    parts = path.split('/')
+    if any(skip in parts for skip in SKIP_DIRS):
+        return False
+    return Path(path).suffix.lower() in ALLOWED_EXTENSIONS
+
+def git_blob_sha(path):
+    """计算本地文件的 git blob SHA，与 tree 接口返回的 sha 可直接比较"""
+    digest = hashlib.sha1(f'blob {path.stat().st_size}\0'.encode())
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def load_state():
+    """读取上次下载的 路径 -> blob SHA 映射"""
+    if not STATE_FILE.exists():
+        return {}
+    try:
+        with open(STATE_FILE, 'r', encoding='utf-8') as f:
+            state = json.load(f)
+    except (json.JSONDecodeError, IOError) as e:
+        log(f'[Error] 下载状态文件读取失败: {e}')
+        return {}
+    if state.get('version') != STATE_VERSION:
+        return {}
+    return state.get('files', {})
+
+def save_state(files, commit_sha):
+    """原子写入下载状态文件"""
+    tmp_file = STATE_FILE.with_name(STATE_FILE.name + '.tmp')
+    with open(tmp_file, 'w', encoding='utf-8') as f:
+        json.dump({'version': STATE_VERSION, 'commit': commit_sha, 'files': files},
+                  f, ensure_ascii=False, indent=2, sort_keys=True)
+    os.replace(tmp_file, STATE_FILE)
+
+def is_current(path, sha, state):
+    """本地文件是否已是指定 blob：状态文件记录一致时只检查文件存在，否则计算 blob SHA。
+    本地缺失的文件总是重新下载：sync.py 生成目录分片和全量构建时会读取整个源目录，CI 中需检出源文档"""
+    dest = WORKSPACE / path
+    if not dest.is_file():
+        return False
+    if state.get(path) == sha:
+        return True
+    return git_blob_sha(dest) == sha
+
+def remove_file(path):
+    """删除已从仓库中移除的文件，并清理空目录"""
+    workspace = WORKSPACE.resolve()
+    dest = (WORKSPACE / path).resolve()
+    if workspace not in dest.parents:
+        log(f'[Error] 拒绝删除工作区之外的路径: {path}')
+        return False
+    if not dest.is_file():
+        return False
+    dest.unlink()
+    log(f'[Delete] {path}')
+    parent = dest.parent
+    while parent != workspace:
+        try:
+            parent.rmdir()
+        except OSError:
+            break
+        parent = parent.parent
+    return True
+
+def write_atomic(dest, content, expected_sha=None):
+    """先写入同目录临时文件再重命名，读取方不会看到写了一半的文件。
+    content 可以是 bytes 或文件对象；指定 expected_sha 时校验 git blob SHA，不一致则放弃写入"""
+    dest.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=dest.parent, prefix=f'.{dest.name}.', suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            if isinstance(content, bytes):
+                f.write(content)
+            else:
+                shutil.copyfileobj(content, f, HASH_CHUNK_SIZE)
+        if expected_sha is not None and git_blob_sha(Path(tmp_path)) != expected_sha:
+            os.unlink(tmp_path)
+            return False
+        os.replace(tmp_path, dest)
+        return True
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
 
 def download_file(path, sha):
     """下载单个文件"""
-    url = f'https://api.github.com/repos/{REPO}/git/blobs/{sha}'
-    headers = {'Authorization': f'token {TOKEN}', 'Accept': 'application/vnd.github.v3.raw'}
+    content = api_get(f'/repos/{REPO}/git/blobs/{sha}', 'application/vnd.github.v3.raw')
+    write_atomic(WORKSPACE / path, content)
+    log(f'[Download] {path}')
+
+def fetch_archive(commit_sha, pending, on_done=None):
+    """下载指定 commit 的 tar.gz 归档并边下载边解压，只提取 pending(路径 -> sha)中的文件。
+    提取成功的文件从 pending 中移除并调用 on_done(路径, sha)，剩余文件(包括中途失败时)由调用方逐个下载"""
+    headers = {'User-Agent': 'front-text-sync'}
+    if TOKEN:
+        headers['Authorization'] = f'token {TOKEN}'
+    req = urllib.request.Request(f'{API_URL}/repos/{REPO}/tarball/{commit_sha}', headers=headers)
     
-    import urllib.request
-    req = urllib.request.Request(url, headers=headers)
-    with urllib.request.urlopen(req) as resp:
-        content = resp.read()
-        
-        dest = WORKSPACE / path
-        dest.parent.mkdir(parents=True, exist_ok=True)
-        with open(dest, 'wb') as f:
-            f.write(content)
-        print(f'[Download] {path}')
+    with urllib.request.urlopen(req, timeout=300) as resp:
+        with tarfile.open(fileobj=resp, mode='r|gz') as archive:
+            for member in archive:
+                if not member.isfile():
+                    continue
+                # 归档内的路径带有 "<owner>-<repo>-<sha>/" 前缀
+                parts = member.name.split('/', 1)
+                if len(parts) != 2 or parts[1] not in pending:
+                    continue
+                path = parts[1]
+                if write_atomic(WORKSPACE / path, archive.extractfile(member), pending[path]):
+                    sha = pending.pop(path)
+                    log(f'[Archive] {path}')
+                    if on_done is not None:
+                        on_done(path, sha)
+                else:
+                    log(f'[Archive] 内容与 blob SHA 不一致，改为单独下载: {path}')
 
-def main():
-    print(f'[Download] 仓库: {REPO}, 分支: {BRANCH}')
+def download_all(items, workers=DEFAULT_WORKERS, on_done=None):
+    """并发下载 (路径, sha) 列表，每个文件写入后在下载线程中调用 on_done(路径, sha)，返回下载失败的路径集合"""
+    failed = set()
     
-    # 获取最新 commit
-    result = run_cmd(f'git ls-remote https://github.com/{REPO}.git {BRANCH}')
-    if result.returncode != 0:
-        print('[Error] 无法获取仓库信息')
-        return
+    def task(item):
+        path, sha = item
+        try:
+            download_file(path, sha)
+            if on_done is not None:
+                on_done(path, sha)
+            return None
+        except Exception as e:
+            log(f'[Error] 下载失败: {path} - {e}')
+            return path
+    
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        for path in executor.map(task, items):
+            if path is not None:
+                failed.add(path)
+    return failed
+
+class SyncPipeline:
+    """
+    流水线模式：下载的同时在后台线程中运行 sync.py 的定向同步(Builder.build 的 changed 参数)。
+    每个写入完成的文件按 git diff --name-status 格式放入有界队列，同步线程取出后立即提交转换；
+    转换跟不上时同步线程停止取队列，队列满后下载线程在 put 处等待，内存占用不随文件数增长
+    """
+    
+    def __init__(self, jobs=0, queue_size=DEFAULT_QUEUE_SIZE, quiet=False):
+        sys.path.insert(0, str(Path(__file__).parent))
+        import sync
+        # 同步线程的日志与下载日志共用一个锁，两个线程的输出不会混在同一行
+        sync.set_print_lock(_print_lock)
+        self.sync = sync
+        self.jobs = jobs
+        self.quiet = quiet
+        self.queue = queue.Queue(maxsize=max(1, queue_size))
+        self.closed = False
+        self.state = None
+        self.error = None
+        self.thread = threading.Thread(target=self.run, name='sync-pipeline', daemon=True)
+    
+    def start(self):
+        self.thread.start()
+    
+    def put(self, line):
+        self.queue.put(line)
     
-    commit_sha = result.stdout.split()[0]
-    print(f'[Download] Commit: {commit_sha}')
+    def lines(self):
+        # None 表示下载结束
+        while not self.closed:
+            line = self.queue.get()
+            if line is None:
+                self.closed = True
+            else:
+                yield line
+    
+    def run(self):
+        sync = self.sync
+        sync.set_quiet(self.quiet)
+        reader_dir = WORKSPACE / 'reader'
+        try:
+            with sync.Builder(self.jobs) as builder:
+                self.state = builder.build(reader_dir / 'config.json', reader_dir, root_dir=WORKSPACE,
+                                           changed=self.lines())
+            if self.state is not None:
+                sync.log_metrics_summary()
+        except Exception as e:
+            self.error = e
+            log(f'[Error] 同步失败: {e}')
+        finally:
+            # 同步中途失败时继续取走队列中的路径，下载线程不会因队列已满而阻塞
+            for _ in self.lines():
+                pass
+    
+    def finish(self):
+        """通知下载结束，等待同步完成；同步成功时返回 True"""
+        self.queue.put(None)
+        self.thread.join()
+        return self.error is None and self.state is not None
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='使用 GitHub API 只下载 txt/md/docx 文件')
+    parser.add_argument('--full', action='store_true', help='忽略下载状态，重新下载全部文件')
+    parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS, help=f'并发下载线程数（默认 {DEFAULT_WORKERS}）')
+    parser.add_argument('--commit', help='直接使用指定 commit，不执行 git ls-remote')
+    parser.add_argument('--mode', choices=['auto', 'blob', 'archive'], default='auto',
+                        help='auto: 变化文件数达到阈值时使用归档模式，否则逐个下载 blob')
+    parser.add_argument('--archive-threshold', type=int, default=ARCHIVE_THRESHOLD,
+                        help=f'auto 模式下切换为归档模式的变化文件数（默认 {ARCHIVE_THRESHOLD}）')
+    parser.add_argument('--changed-out', help='将相对上次下载新增、修改、删除的文件按 git diff --name-status 格式写入该文件')
+    parser.add_argument('--sync', action='store_true',
+                        help='流水线模式：下载的同时转换变化的文件(sync.py 定向同步)，下载和转换重叠进行')
+    parser.add_argument('-j', '--jobs', type=int, default=0, help='流水线模式下的转换进程数，0 表示使用全部 CPU 核心（默认 0）')
+    parser.add_argument('--queue-size', type=int, default=DEFAULT_QUEUE_SIZE,
+                        help=f'流水线模式下等待转换的文件数上限，达到后下载暂停（默认 {DEFAULT_QUEUE_SIZE}）')
+    parser.add_argument('-q', '--quiet', action='store_true', help='流水线模式下同步只输出阶段汇总和错误')
+    args = parser.parse_args(argv)
+
+    log(f'[Download] 仓库: {REPO}, 分支: {BRANCH}, API: {API_URL}')
+    
+    # 获取最新 commit
+    if args.commit:
+        commit_sha = args.commit
+    else:
+        result = run_cmd(f'git ls-remote https://github.com/{REPO}.git {BRANCH}')
+        if result.returncode != 0:
+            log('[Error] 无法获取仓库信息')
+            return
+        commit_sha = result.stdout.split()[0]
+    log(f'[Download] Commit: {commit_sha}')
     
     # 获取文件列表
-    files = get_tree_filesRecursive(commit_sha)
+    files, truncated = get_tree_filesRecursive(commit_sha)
+    state = {} if args.full else load_state()
     
-    downloaded = 0
+    wanted = {}
     skipped = 0
     
     for item in files:
@@ -74,21 +372,96 @@ def main():
             continue
         
         path = item['path']
-        parts = path.split('/')
-        
-        # 跳过目录
-        if any(skip in parts for skip in SKIP_DIRS):
-            continue
-        
-        # 只下载允许的类型
-        ext = Path(path).suffix.lower()
-        if ext in ALLOWED_EXTENSIONS:
-            download_file(path, item['sha'])
-            downloaded += 1
-        else:
+        if is_allowed(path):
+            wanted[path] = item['sha']
+        elif not any(skip in path.split('/') for skip in SKIP_DIRS):
             skipped += 1
     
-    print(f'[Download] 完成: {downloaded} 文件, 跳过 {skipped} 个不支持的类型')
+    downloaded = 0
+    unchanged = 0
+    new_state = {}
+    
+    to_fetch = []
+    
+    # 本地文件与状态文件记录的 blob SHA 一致时跳过，不一致时计算本地文件的 blob SHA 再比较；
+    # 检出的源文档已是最新时只上报变化，不重新下载。
+    for path, sha in wanted.items():
+        if not args.full and is_current(path, sha, state):
+            unchanged += 1
+            new_state[path] = sha
+        else:
+            to_fetch.append((path, sha))
+    
+    # 流水线模式下变化的文件在写入或删除后立即交给同步线程
+    pipeline = None
+    if args.sync:
+        pipeline = SyncPipeline(args.jobs, args.queue_size, args.quiet)
+        pipeline.start()
+    changed = []
+    
+    def report(status, path):
+        line = f'{status}\t{path}'
+        changed.append(line)
+        if pipeline is not None:
+            pipeline.put(line)
+    
+    def on_done(path, sha):
+        if state.get(path) != sha:
+            report('M', path)
+    
+    for path, sha in sorted(new_state.items()):
+        on_done(path, sha)
+    
+    # 仓库中已删除的文件：tree 被截断时列表不完整，不做删除
+    removed = 0
+    if truncated:
+        log('[Download] 文件列表被截断，跳过删除检查')
+    else:
+        for path in sorted(state.keys() - wanted.keys()):
+            if remove_file(path):
+                removed += 1
+            report('D', path)
+    
+    mode = args.mode
+    if mode == 'auto':
+        mode = 'archive' if len(to_fetch) >= args.archive_threshold else 'blob'
+    
+    pending = dict(to_fetch)
+    if mode == 'archive' and pending:
+        log(f'[Download] 归档模式: {len(pending)} 个文件需要更新')
+        try:
+            fetch_archive(commit_sha, pending, on_done)
+        except Exception as e:
+            log(f'[Error] 归档下载中断，剩余 {len(pending)} 个文件改为逐个下载: {e}')
+    
+    failed = download_all(list(pending.items()), args.workers, on_done)
+    for path, sha in to_fetch:
+        if path in failed:
+            # 保留旧记录，下次运行时重新比较并下载
+            if path in state:
+                new_state[path] = state[path]
+        else:
+            new_state[path] = sha
+            downloaded += 1
+    if truncated:
+        for path, sha in state.items():
+            new_state.setdefault(path, sha)
+    
+    if pipeline is not None and not pipeline.finish():
+        # 不保存下载状态：下次运行时这些文件仍按变化处理，重新交给同步
+        log('[Error] 同步失败，未保存下载状态')
+        return 1
+    
+    save_state(new_state, commit_sha)
+    if args.changed_out:
+        with open(args.changed_out, 'w', encoding='utf-8') as f:
+            f.write(''.join(line + '\n' for line in sorted(changed)))
+        log(f'[Download] 变化列表: {args.changed_out} ({len(changed)} 个文件)')
+    log(f'[Download] 完成: 下载 {downloaded} 个, 未变化 {unchanged} 个, 删除 {removed} 个, 跳过 {skipped} 个不支持的类型')
+    if failed:
+        log(f'[Error] {len(failed)} 个文件下载失败')
+        return 1
+    return 0
 
 if __name__ == '__main__':
-    main()
+    sys.exit(main())
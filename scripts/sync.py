@@ -9,14 +9,82 @@ import os
 import re
 import json
 import shutil
+import hashlib
+import gzip
+import time
+import inspect
+import argparse
+import signal
+import threading
+import contextlib
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, FIRST_COMPLETED, as_completed, wait
+from concurrent.futures.process import BrokenProcessPool
+from functools import partial
+from itertools import chain, islice
 from pathlib import Path
 from datetime import datetime
-from fnmatch import fnmatch, fnmatchcase
+from collections import Counter
+from fnmatch import translate
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
 
 SKIP_NAMES = ['.git', '__pycache__', 'node_modules', '.github', 'reader', 'scripts']
 ALLOWED_EXTENSIONS = {'.txt', '.md', '.docx'}
 
-CONFIG_FILE = Path(__file__).parent.parent / 'reader' / 'config.json'
+MANIFEST_VERSION = 1
+CONVERTER_VERSION = '1'
+HASH_CHUNK_SIZE = 1024 * 1024
+WRITE_BATCH_SIZE = 64 * 1024
+FICLONE = 0x40049409
+
+CONVERT_MODULES = {'.txt': 'Sync-TXT', '.md': 'Sync-MD', '.docx': 'Sync-DOCX'}
+
+NAV_VERSION = 2
+
+SEGMENT_VERSION = 1
+SEGMENT_DIR_SUFFIX = '.segments'
+
+OUTLINE_VERSION = 1
+OUTLINE_SUFFIX = '.outline.json'
+# 锚点带前缀，避免与阅读器页面中的元素 id(sidebar、viewer 等)冲突
+ANCHOR_PREFIX = 'h-'
+
+TABLES_VERSION = 1
+TABLES_SUFFIX = '.tables.json'
+TABLE_PREVIEW_ROWS = 50
+
+ASSET_MANIFEST_VERSION = 1
+COMPRESSIBLE_SUFFIXES = ('.html', '.txt', '.json')
+
+METRICS_VERSION = 1
+
+SEARCH_VERSION = 1
+SEARCH_SHARD_SHIFT = 6
+SEARCH_MAX_WORD_LENGTH = 32
+
+# 参与渲染和分词的函数与常量，计入渲染代码指纹(见 get_renderer_fingerprint)
+RENDER_FUNCTIONS = (
+    'escape_html', 'process_inline', 'tokenize_blocks', 'render_block', 'make_anchor', 'render_heading',
+    'render_markdown', 'iter_lines', 'convert_markdown', 'split_table_row', 'get_table_align', 'find_table_body',
+    'render_table_rows', 'render_table', 'collect_table_columns', 'write_asset', 'convert_docx', 'post_process_html',
+    'render_content', 'render_markdown_file', 'split_segments', 'tag_outline', 'write_outline', 'write_tables',
+    'render_segmented_file', 'tokenize_text', 'collect_terms', 'unescape_html'
+)
+RENDER_CONSTANTS = (
+    'CONVERTER_VERSION', 'SEGMENT_VERSION', 'SEGMENT_DIR_SUFFIX', 'OUTLINE_VERSION', 'ANCHOR_PREFIX', 'TABLES_VERSION',
+    'TABLE_PREVIEW_ROWS', 'IMAGE_EXTENSIONS', 'SEARCH_MAX_WORD_LENGTH'
+)
+
+ROOT_DIR = Path(__file__).parent.parent
+CONFIG_FILE = ROOT_DIR / 'reader' / 'config.json'
 
 is_github_actions = os.environ.get('GITHUB_ACTIONS') == 'true' or os.environ.get('CI') == 'true'
 
@@ -24,41 +92,175 @@ if is_github_actions:
     sync_root = os.environ.get('SYNC_ROOT_DIR', Path.cwd())
     CONFIG_FILE = Path(sync_root) / 'reader' / 'config.json'
 
+_quiet = False
+_last_timestamp = (None, '')
+_print_lock = threading.Lock()
+
+def format_timestamp():
+    # 同一秒内的日志复用格式化后的时间戳
+    global _last_timestamp
+    now = int(time.time())
+    if _last_timestamp[0] != now:
+        _last_timestamp = (now, datetime.fromtimestamp(now).strftime("%Y-%m-%d %H:%M:%S"))
+    return _last_timestamp[1]
+
+def set_quiet(quiet):
+    # 安静模式只输出汇总和错误，标准输出改为块缓冲，结束时统一刷新
+    global _quiet
+    _quiet = quiet
+    if quiet and hasattr(sys.stdout, 'reconfigure'):
+        sys.stdout.reconfigure(line_buffering=False)
+
+def set_print_lock(lock):
+    # 与同一进程中其他线程的输出(download-files.py 流水线模式的下载日志)共用一个锁，每条日志完整输出
+    global _print_lock
+    _print_lock = lock
+
+def write_log(line):
+    with _print_lock:
+        print(line)
+
 def log_info(msg, module='Sync'):
-    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    print(f'[{module}][{timestamp}] {msg}')
+    write_log(f'[{module}][{format_timestamp()}] {msg}')
+
+def log_detail(msg, module='Sync'):
+    # 逐文件日志，安静模式下不输出
+    if not _quiet:
+        write_log(f'[{module}][{format_timestamp()}] {msg}')
 
 def log_error(msg, module='Sync'):
-    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    print(f'[{module}][{timestamp}] [ERROR] {msg}')
+    write_log(f'[{module}][{format_timestamp()}] [ERROR] {msg}')
+
+_metrics = {'stages': {}, 'files': [], 'counters': Counter(), 'worker_cpu': 0.0}
+
+def reset_metrics():
+    global _metrics
+    _metrics = {'stages': {}, 'files': [], 'counters': Counter(), 'worker_cpu': 0.0}
+
+def get_cpu_time():
+    # 本进程的 CPU 时间加上进程池中已完成的转换上报的 CPU 时间。不使用 os.times() 的 children_*：
+    # 它只包含已回收的子进程，Builder 长期复用的进程池在阶段内不会被回收
+    return time.process_time() + _metrics['worker_cpu']
+
+def add_worker_cpu(result):
+    _metrics['worker_cpu'] += result.get('cpu', 0.0)
+
+@contextlib.contextmanager
+def measure_stage(name):
+    wall_start = time.perf_counter()
+    cpu_start = get_cpu_time()
+    try:
+        yield
+    finally:
+        _metrics['stages'][name] = {
+            'wall': round(time.perf_counter() - wall_start, 6),
+            'cpu': round(get_cpu_time() - cpu_start, 6)
+        }
+
+def count_metric(name, n=1):
+    _metrics['counters'][name] += n
+
+def record_file_metric(rel_key, action, seconds, input_bytes, output_bytes):
+    _metrics['files'].append({
+        'path': rel_key,
+        'action': action,
+        'seconds': round(seconds, 6),
+        'input_bytes': input_bytes,
+        'output_bytes': output_bytes
+    })
+
+def get_slowest_files(n):
+    return sorted(_metrics['files'], key=lambda f: f['seconds'], reverse=True)[:n]
+
+def write_metrics(metrics_file, slowest=10):
+    files = _metrics['files']
+    data = {
+        'version': METRICS_VERSION,
+        'generated': datetime.now().isoformat(timespec='seconds'),
+        'stages': _metrics['stages'],
+        'counters': dict(sorted(_metrics['counters'].items())),
+        'totals': {
+            'files': len(files),
+            'seconds': round(sum(f['seconds'] for f in files), 6),
+            'input_bytes': sum(f['input_bytes'] for f in files),
+            'output_bytes': sum(f['output_bytes'] for f in files)
+        },
+        'slowest': get_slowest_files(slowest),
+        'files': files
+    }
+    metrics_file = Path(metrics_file)
+    tmp_file = metrics_file.with_name(metrics_file.name + '.tmp')
+    try:
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            f.write(json.dumps(data, ensure_ascii=False, indent=2))
+        os.replace(tmp_file, metrics_file)
+        log_info(f'性能指标已写入: {metrics_file}', 'Sync-Metrics')
+    except Exception as e:
+        log_error(f'写入性能指标失败: {e}', 'Sync-Metrics')
+
+def log_metrics_summary(slowest=10):
+    for name, stage in _metrics['stages'].items():
+        log_info(f'{name:<24} wall={stage["wall"]:.3f}s cpu={stage["cpu"]:.3f}s', 'Sync-Metrics')
+    counters = _metrics['counters']
+    if counters:
+        log_info(' '.join(f'{name}={value}' for name, value in sorted(counters.items())), 'Sync-Metrics')
+    for record in get_slowest_files(slowest):
+        log_info(f'最慢: {record["path"]} {record["seconds"]:.3f}s ({record["input_bytes"]} → {record["output_bytes"]} 字节)',
+                 'Sync-Metrics')
 
 _config_cache = None
+_config_warnings = set()
+# 当前构建的站点：清单、搜索缓存相对 _root_dir，生成文件写入 _reader_dir。Builder 构建其他站点时切换
+_root_dir = ROOT_DIR
+_reader_dir = ROOT_DIR / 'reader'
+
+def read_config(config_file):
+    config_file = Path(config_file)
+    if not config_file.exists():
+        log_error(f'配置文件不存在: {config_file}')
+        return None
+    try:
+        with open(config_file, 'r', encoding='utf-8') as f:
+            config = json.load(f)
+        log_info(f'配置文件加载成功: {config_file}')
+        return config
+    except (json.JSONDecodeError, IOError) as e:
+        log_error(f'配置文件加载错误: {e}')
+        return None
 
 def load_config():
     global _config_cache
     if _config_cache is not None:
         return _config_cache
     
-    if CONFIG_FILE.exists():
-        try:
-            with open(CONFIG_FILE, 'r', encoding='utf-8') as f:
-                config = json.load(f)
-            log_info(f'配置文件加载成功: {CONFIG_FILE}')
-            _config_cache = config
-            return config
-        except (json.JSONDecodeError, IOError) as e:
-            log_error(f'配置文件加载错误: {e}')
-            return {}
-    else:
-        log_error(f'配置文件不存在: {CONFIG_FILE}')
+    config = read_config(CONFIG_FILE)
+    if config is None:
         return {}
+    _config_cache = config
+    return config
+
+def use_site(config, root_dir, reader_dir):
+    # 切换当前站点的配置和目录；排除规则依赖配置，一并失效
+    global _config_cache, _root_dir, _reader_dir, _exclude_matcher
+    _config_cache = config
+    _root_dir = Path(root_dir)
+    _reader_dir = Path(reader_dir)
+    _exclude_matcher = None
+
+def get_site():
+    return {'config': load_config(), 'root_dir': _root_dir, 'reader_dir': _reader_dir}
 
 def get_source_dir():
     return load_config().get('source_dir', '')
 
+def get_root_dir():
+    return _root_dir
+
+def get_reader_dir():
+    return _reader_dir
+
 def get_docs_dir():
-    root_dir = Path(__file__).parent.parent
-    return root_dir / 'reader' / 'docs'
+    return _reader_dir / 'docs'
 
 def get_exclude_patterns():
     return load_config().get('exclude_patterns', [])
@@ -81,173 +283,663 @@ def get_home_page():
 def get_github_repo():
     return load_config().get('github_repo', '')
 
+def get_number_config(key, default, minimum, convert=int):
+    # 数值配置：无法转换或小于 minimum 时使用默认值并输出警告(同一取值只警告一次)
+    value = load_config().get(key, default)
+    try:
+        if isinstance(value, bool):
+            raise ValueError
+        number = convert(value)
+    except (TypeError, ValueError):
+        number = None
+    if number is not None and minimum <= number < float('inf'):
+        return number
+    if (key, repr(value)) not in _config_warnings:
+        _config_warnings.add((key, repr(value)))
+        log_error(f'配置项 {key} 无效: {value!r}，使用默认值 {default}')
+    return default
+
+def get_stream_render_threshold():
+    # 单位为 MB，可以是小数；必须大于 0
+    threshold_mb = get_number_config('stream_render_threshold_mb', 8, sys.float_info.min, float)
+    return int(threshold_mb * 1024 * 1024)
+
+def get_full_text_search():
+    return load_config().get('full_text_search', True)
+
+def get_assets_dir():
+    return _reader_dir / 'assets'
+
+def get_search_dir():
+    return _reader_dir / 'search'
+
+def get_search_cache_file():
+    return get_manifest_file().with_name('.sync-search-cache.json')
+
+def get_prerender_txt():
+    return load_config().get('prerender_txt', False)
+
+def get_txt_segment_size():
+    # 每段 HTML 的字符数，至少为 1
+    return get_number_config('txt_segment_size', 256 * 1024, 1)
+
+def get_txt_publish():
+    return load_config().get('txt_publish', 'auto')
+
+def get_table_virtual_rows():
+    # 0 表示不生成大表格数据文件
+    return get_number_config('table_virtual_rows', 1000, 0)
+
+def get_precompress():
+    return load_config().get('precompress', True)
+
+def get_manifest_file():
+    return _root_dir / load_config().get('manifest_file', '.sync-manifest.json')
+
+def hash_bytes(data):
+    return hashlib.sha256(data).hexdigest()
+
+def hash_file(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+_renderer_fingerprint = None
+
+def write_output(dest_path, content):
+    """
+    content 为 str、bytes 或 str 片段的可迭代对象。先写入同目录的临时文件并同时计算哈希，
+    与已有文件内容相同时丢弃临时文件，否则以 os.replace 原子替换。返回 (sha256, 是否写入)
+    """
+    digest = hashlib.sha256()
+    tmp_file = dest_path.with_name(f'{dest_path.name}.{os.getpid()}.tmp')
+    try:
+        with open(tmp_file, 'wb') as f:
+            if isinstance(content, bytes):
+                digest.update(content)
+                f.write(content)
+            else:
+                if isinstance(content, str):
+                    content = (content,)
+                batch = []
+                size = 0
+                for chunk in content:
+                    batch.append(chunk)
+                    size += len(chunk)
+                    # 渲染器产出的片段很小，攒够一批再编码写入
+                    if size >= WRITE_BATCH_SIZE:
+                        data = ''.join(batch).encode('utf-8')
+                        digest.update(data)
+                        f.write(data)
+                        batch = []
+                        size = 0
+                data = ''.join(batch).encode('utf-8')
+                digest.update(data)
+                f.write(data)
+    except BaseException:
+        tmp_file.unlink(missing_ok=True)
+        raise
+    
+    content_hash = digest.hexdigest()
+    try:
+        unchanged = dest_path.stat().st_size == tmp_file.stat().st_size and hash_file(dest_path) == content_hash
+    except FileNotFoundError:
+        unchanged = False
+    if unchanged:
+        tmp_file.unlink()
+        return content_hash, False
+    os.replace(tmp_file, dest_path)
+    return content_hash, True
+
+def clone_file(src_path, dst_path):
+    # 依次尝试 reflink(FICLONE)、copy_file_range，均不可用时回退到 shutil.copyfile
+    with open(src_path, 'rb') as src, open(dst_path, 'wb') as dst:
+        if fcntl is not None:
+            try:
+                fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+                return 'reflink'
+            except OSError:
+                pass
+        if hasattr(os, 'copy_file_range'):
+            try:
+                remaining = os.fstat(src.fileno()).st_size
+                while remaining > 0:
+                    copied = os.copy_file_range(src.fileno(), dst.fileno(), remaining)
+                    if copied == 0:
+                        break
+                    remaining -= copied
+                if remaining == 0:
+                    return 'copy_file_range'
+            except OSError:
+                pass
+    shutil.copyfile(src_path, dst_path)
+    return 'copy'
+
+def publish_file(src_path, dest_path, source_hash, mode='auto'):
+    """
+    发布 TXT：目标内容与源文件相同时不写入；mode 为 hardlink 时优先创建硬链接，
+    否则使用 clone_file。结果先落在临时文件，再原子替换目标。返回使用的方式
+    """
+    try:
+        if dest_path.stat().st_size == os.path.getsize(src_path) and hash_file(dest_path) == source_hash:
+            return 'unchanged'
+    except FileNotFoundError:
+        pass
+    tmp_file = dest_path.with_name(f'{dest_path.name}.{os.getpid()}.tmp')
+    tmp_file.unlink(missing_ok=True)
+    try:
+        method = None
+        if mode == 'hardlink':
+            try:
+                os.link(src_path, tmp_file)
+                method = 'hardlink'
+            except OSError:
+                pass
+        if method is None:
+            method = clone_file(src_path, tmp_file)
+            shutil.copystat(src_path, tmp_file)
+        os.replace(tmp_file, dest_path)
+        return method
+    except BaseException:
+        tmp_file.unlink(missing_ok=True)
+        raise
+
+def get_renderer_fingerprint():
+    # 只取决定输出内容的函数、常量和正则：它们变化后所有已生成的文件都需要重新转换，
+    # 日志、下载、索引和发布等其他代码的修改不影响已有输出。转换流程本身的变化通过 CONVERTER_VERSION 标记
+    global _renderer_fingerprint
+    if _renderer_fingerprint is None:
+        namespace = globals()
+        parts = [inspect.getsource(namespace[name]) for name in RENDER_FUNCTIONS]
+        parts += [repr(namespace[name]) for name in RENDER_CONSTANTS]
+        parts += sorted(value.pattern for value in namespace.values() if isinstance(value, re.Pattern)
+                        and isinstance(value.pattern, str))
+        _renderer_fingerprint = hash_bytes('\0'.join(parts).encode('utf-8'))
+    return _renderer_fingerprint
+
+def get_config_fingerprint():
+    # 只包含影响生成文件的配置(取生效值)：主题、标题、首页等只由阅读器读取的配置变化后不需要重新转换
+    settings = {
+        'source_dir': get_source_dir(),
+        'exclude_patterns': get_exclude_patterns(),
+        'exclude_files': get_exclude_files(),
+        'prerender_txt': get_prerender_txt(),
+        'txt_segment_size': get_txt_segment_size(),
+        'table_virtual_rows': get_table_virtual_rows(),
+        'full_text_search': get_full_text_search()
+    }
+    return hash_bytes(json.dumps(settings, ensure_ascii=False, sort_keys=True).encode('utf-8'))
+
+def get_converter_version(suffix):
+    return f'{suffix.lstrip(".")}-{CONVERTER_VERSION}-{get_renderer_fingerprint()[:16]}'
+
+def load_manifest():
+    manifest_file = get_manifest_file()
+    if not manifest_file.exists():
+        log_info(f'构建清单不存在，执行全量构建: {manifest_file}', 'Sync-Manifest')
+        return {}
+    try:
+        with open(manifest_file, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+    except (json.JSONDecodeError, IOError) as e:
+        log_error(f'构建清单加载错误: {e}', 'Sync-Manifest')
+        return {}
+    if manifest.get('version') != MANIFEST_VERSION:
+        log_info('构建清单版本不匹配，执行全量构建', 'Sync-Manifest')
+        return {}
+    return manifest.get('files', {})
+
+def save_manifest(entries):
+    manifest_file = get_manifest_file()
+    tmp_file = manifest_file.with_name(manifest_file.name + '.tmp')
+    try:
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            json.dump({'version': MANIFEST_VERSION, 'files': entries}, f, ensure_ascii=False, indent=2, sort_keys=True)
+        os.replace(tmp_file, manifest_file)
+        log_info(f'保存构建清单: {manifest_file} ({len(entries)} 项)', 'Sync-Manifest')
+    except Exception as e:
+        log_error(f'保存构建清单失败: {e}', 'Sync-Manifest')
+
+def make_manifest_entry(source_hash, output_hash, output_rel, converter, config_fp, assets=None, segments=None,
+                        outline=None, tables=None):
+    entry = {
+        'source_hash': source_hash,
+        'output': output_rel,
+        'output_hash': output_hash,
+        'converter': converter,
+        'config': config_fp
+    }
+    if assets:
+        entry['assets'] = assets
+    if segments:
+        entry['segments'] = segments
+    if outline:
+        entry['outline'] = outline
+    if tables:
+        entry['tables'] = tables
+    return entry
+
+def is_up_to_date(entry, source_hash, dest_path, converter, config_fp):
+    if not entry or not dest_path.exists():
+        return False
+    if entry.get('source_hash') != source_hash:
+        return False
+    if entry.get('converter') != converter or entry.get('config') != config_fp:
+        return False
+    assets_dir = get_assets_dir()
+    if not all((assets_dir / name).exists() for name in entry.get('assets', ())):
+        return False
+    if not all((dest_path.parent / name).exists() for name in entry.get('segments', ())):
+        return False
+    if entry.get('outline') and not get_outline_file(dest_path).exists():
+        return False
+    if entry.get('tables') and not get_tables_file(dest_path).exists():
+        return False
+    return hash_file(dest_path) == entry.get('output_hash')
+
 def should_skip(path):
     return any(path.name.startswith(s) for s in SKIP_NAMES)
 
-def match_patterns(rel_path, patterns):
-    rel_str = str(rel_path).replace('\\', '/')
+_exclude_matcher = None
+
+def compile_exclude_patterns(patterns):
+    # 所有排除模式合并为一个正则，"**/x" 同时匹配根目录下的 x 和任意层级下的 x
+    alternatives = []
     for pattern in patterns:
-        if pattern.startswith('**/') or fnmatch(rel_str, pattern):
-            return True
-        if fnmatch(rel_str, pattern.replace('*', '**')):
-            return True
-    return False
+        alternatives.append(translate(pattern))
+        if pattern.startswith('**/'):
+            alternatives.append(translate(pattern[3:]))
+    if not alternatives:
+        return None
+    return re.compile('|'.join(f'(?:{alt})' for alt in alternatives))
+
+def split_exclude_patterns(patterns):
+    # 以 "/" 结尾的模式只匹配目录，以支持的文档扩展名结尾的模式(如 "*.md")只匹配文件，其余两者都匹配。
+    # 返回 (文件模式, 目录模式)
+    file_patterns = []
+    dir_patterns = []
+    for pattern in patterns:
+        if pattern.endswith('/'):
+            dir_patterns.append(pattern.rstrip('/'))
+        elif Path(pattern).suffix.lower() in ALLOWED_EXTENSIONS:
+            file_patterns.append(pattern)
+        else:
+            file_patterns.append(pattern)
+            dir_patterns.append(pattern)
+    return file_patterns, dir_patterns
 
-def should_exclude(file_path, source_dir):
-    rel_path = file_path.relative_to(source_dir)
-    if match_patterns(rel_path, get_exclude_patterns()):
+def get_exclude_matcher():
+    # (文件正则, 目录正则, 排除的文件名)
+    global _exclude_matcher
+    if _exclude_matcher is None:
+        file_patterns, dir_patterns = split_exclude_patterns(get_exclude_patterns())
+        _exclude_matcher = (compile_exclude_patterns(file_patterns), compile_exclude_patterns(dir_patterns),
+                            frozenset(get_exclude_files()))
+    return _exclude_matcher
+
+def should_exclude_dir(rel_key, name):
+    # 目录名或目录相对路径命中目录模式时，整个子树在遍历前被剪枝
+    regex = get_exclude_matcher()[1]
+    return regex is not None and (regex.match(name) is not None or regex.match(rel_key) is not None)
+
+def should_exclude_file(rel_key, name, suffix, verbose=True):
+    regex, _, exclude_files = get_exclude_matcher()
+    if regex is not None and regex.match(rel_key) is not None:
         return True
-    if rel_path.name in get_exclude_files():
+    if name in exclude_files:
         return True
-    if file_path.suffix not in ALLOWED_EXTENSIONS:
-        log_info(f'跳过(不支持类型): {rel_path}', 'Sync-Filter')
+    if suffix not in ALLOWED_EXTENSIONS:
+        if verbose:
+            log_detail(f'跳过(不支持类型): {rel_key}', 'Sync-Filter')
         return True
     return False
 
 def escape_html(text):
     return text.replace('&', '&amp;').replace('<', '&lt;').replace('>', '&gt;')
 
+BOLD_RE = re.compile(r'\*\*([^*]+)\*\*')
+EM_RE = re.compile(r'\*([^*]+)\*')
+CODE_RE = re.compile(r'`([^`]+)`')
+LINK_RE = re.compile(r'\[([^\]]+)\]\(([^)]+)\)')
+AUTOLINK_RE = re.compile(r'(?<![\("])(https?://[^\s<">]+)')
+IMAGE_RE = re.compile(r'!\[([^\]]*)\]\(([^)]+)\)')
+ORDERED_ITEM_RE = re.compile(r'\d+\.\s+')
+TABLE_SEPARATOR_RE = re.compile(r'[\s|:,\-\d]+')
+GIT_STATUS_RE = re.compile(r'[ACDMRTUXB]\d*')
+GIT_ESCAPE_RE = re.compile(rb'\\([0-7]{3}|.)')
+GIT_ESCAPES = {b'a': 7, b'b': 8, b't': 9, b'n': 10, b'v': 11, b'f': 12, b'r': 13}
+ANCHOR_STRIP_RE = re.compile(r'[^\w\- ]+')
+DOCX_HEADING_RE = re.compile(r'<h([1-6])>(.*?)</h\1>', re.S)
+
 def process_inline(text):
     text = escape_html(text)
-    text = re.sub(r'\*\*([^*]+)\*\*', r'<strong>\1</strong>', text)
-    text = re.sub(r'\*([^*]+)\*', r'<em>\1</em>', text)
-    text = re.sub(r'\`([^`]+)\`', r'<code>\1</code>', text)
-    text = re.sub(r'\[([^\]]+)\]\(([^)]+)\)', r'<a href="\2" target="_blank">\1</a>', text)
-    text = re.sub(r'(?<![\("])(https?://[^\s<">]+)', r'<a href="\1" target="_blank">\1</a>', text)
-    text = re.sub(r'!\[([^\]]*)\]\(([^)]+)\)', r'<img src="\2" alt="\1">', text)
+    # 绝大多数行不含任何行内标记，直接返回；否则只执行当前文本可能命中的规则，
+    # 规则顺序与各规则之间的相互作用保持不变
+    if '*' in text:
+        if '**' in text:
+            text = BOLD_RE.sub(r'<strong>\1</strong>', text)
+        if '*' in text:
+            text = EM_RE.sub(r'<em>\1</em>', text)
+    if '`' in text:
+        text = CODE_RE.sub(r'<code>\1</code>', text)
+    if '](' in text:
+        text = LINK_RE.sub(r'<a href="\2" target="_blank">\1</a>', text)
+    if '://' in text:
+        text = AUTOLINK_RE.sub(r'<a href="\1" target="_blank">\1</a>', text)
+    if '](' in text:
+        text = IMAGE_RE.sub(r'<img src="\2" alt="\1">', text)
     return text
 
-def convert_markdown(text):
-    html = []
-    lines = text.split('\n')
-    i = 0
-    while i < len(lines):
-        line = lines[i].rstrip()
+def tokenize_blocks(lines):
+    # 块级分词：按行首字符分派，每行只做一次 strip，产出 (类型, 数据) 记号。
+    # lines 可以是任意行迭代器；列表、引用和代码块以子迭代器的形式产出，
+    # 消费方逐项读取，整个文档不需要一次性载入内存
+    lines = iter(lines)
+    pending = []
+    
+    def next_line():
+        return pending.pop() if pending else next(lines, None)
+    
+    def take_prefixed(first_item, prefix):
+        yield first_item
+        while True:
+            line = next_line()
+            if line is None:
+                return
+            stripped = line.strip()
+            if not stripped.startswith(prefix):
+                pending.append(line)
+                return
+            yield stripped[len(prefix):]
+    
+    def take_ordered(first_item):
+        yield first_item
+        while True:
+            line = next_line()
+            if line is None:
+                return
+            stripped = line.strip()
+            match = ORDERED_ITEM_RE.match(stripped)
+            if not match:
+                pending.append(line)
+                return
+            yield stripped[match.end():]
+    
+    def take_code():
+        while True:
+            line = next_line()
+            if line is None or line.rstrip().startswith('```'):
+                return
+            yield line
+    
+    while True:
+        line = next_line()
+        if line is None:
+            return
         trimmed = line.strip()
         
         if not trimmed:
-            html.append('<br>')
-            i += 1
+            yield 'blank', None
             continue
         
-        if trimmed.startswith('# '):
-            html.append(f'<h1>{process_inline(trimmed[2:])}</h1>')
-            i += 1
-        elif trimmed.startswith('## '):
-            html.append(f'<h2>{process_inline(trimmed[3:])}</h2>')
-            i += 1
-        elif trimmed.startswith('### '):
-            html.append(f'<h3>{process_inline(trimmed[4:])}</h3>')
-            i += 1
-        elif trimmed == '---':
-            html.append('<hr>')
-            i += 1
-        elif trimmed.startswith('> '):
-            quote_lines = []
-            while i < len(lines) and lines[i].strip().startswith('> '):
-                quote_lines.append(process_inline(lines[i].strip()[2:]))
-                i += 1
-            html.append(f'<blockquote>{"<br>".join(quote_lines)}</blockquote>')
-        elif trimmed.startswith('```'):
-            lang = trimmed[3:].strip() if len(trimmed) > 3 else ''
-            code_start = i + 1
-            code_end = i + 1
-            while code_end < len(lines) and not lines[code_end].rstrip().startswith('```'):
-                code_end += 1
-            
-            code_lines = [escape_html(line) for line in lines[code_start:code_end]]
-            html.append(f'<pre><code class="language-{lang}">{"<br>".join(code_lines)}</code></pre>')
-            
-            i = code_end + 1 if code_end < len(lines) else code_end
-        elif trimmed.startswith('- '):
-            list_items = []
-            while i < len(lines) and lines[i].strip().startswith('- '):
-                list_items.append(f'<li>{process_inline(lines[i].strip()[2:])}</li>')
-                i += 1
-            html.append(f'<ul>{"".join(list_items)}</ul>')
-        elif re.match(r'^\d+\.\s', trimmed):
-            list_items = []
-            ordered_pattern = r'^\d+\.\s*'
-            while i < len(lines) and re.match(r'^\d+\.\s', lines[i].strip()):
-                list_items.append(f'<li>{process_inline(re.sub(ordered_pattern, "", lines[i].strip()))}</li>')
-                i += 1
-            html.append(f'<ol>{"".join(list_items)}</ol>')
-        elif trimmed.startswith('|') and '|' in trimmed:
-            table_lines = []
-            while i < len(lines) and lines[i].strip().startswith('|'):
-                table_lines.append(lines[i].rstrip())
-                i += 1
-            html.append(render_table(table_lines))
+        block = None
+        first = trimmed[0]
+        if first == '#':
+            if trimmed.startswith('# '):
+                block = 'heading', (1, trimmed[2:])
+            elif trimmed.startswith('## '):
+                block = 'heading', (2, trimmed[3:])
+            elif trimmed.startswith('### '):
+                block = 'heading', (3, trimmed[4:])
+        elif first == '-':
+            if trimmed == '---':
+                block = 'hr', None
+            elif trimmed.startswith('- '):
+                block = 'ul', take_prefixed(trimmed[2:], '- ')
+        elif first == '>':
+            if trimmed.startswith('> '):
+                block = 'quote', take_prefixed(trimmed[2:], '> ')
+        elif first == '`':
+            if trimmed.startswith('```'):
+                block = 'code', (trimmed[3:].strip(), take_code())
+        elif first == '|':
+            table_lines = [line.rstrip()]
+            while True:
+                line = next_line()
+                if line is None:
+                    break
+                if not line.strip().startswith('|'):
+                    pending.append(line)
+                    break
+                table_lines.append(line.rstrip())
+            block = 'table', table_lines
+        elif first.isdecimal():
+            match = ORDERED_ITEM_RE.match(trimmed)
+            if match:
+                block = 'ol', take_ordered(trimmed[match.end():])
+        
+        if block is None:
+            yield 'paragraph', trimmed
+            continue
+        
+        yield block
+        # 消费方未读完的子迭代器在此耗尽，保证下一个块从正确的位置开始
+        kind, data = block
+        if kind in ('ul', 'ol', 'quote'):
+            for _ in data:
+                pass
+        elif kind == 'code':
+            for _ in data[1]:
+                pass
+
+def render_block(kind, data, tables=None):
+    if kind == 'paragraph':
+        yield f'<p>{process_inline(data)}</p>'
+    elif kind == 'blank':
+        yield '<br>'
+    elif kind == 'heading':
+        level, text = data
+        yield render_heading(level, process_inline(text), set())
+    elif kind == 'ul' or kind == 'ol':
+        yield f'<{kind}>'
+        for item in data:
+            yield f'<li>{process_inline(item)}</li>'
+        yield f'</{kind}>'
+    elif kind == 'quote':
+        yield '<blockquote>'
+        separator = ''
+        for line in data:
+            yield separator + process_inline(line)
+            separator = '<br>'
+        yield '</blockquote>'
+    elif kind == 'code':
+        lang, code_lines = data
+        yield f'<pre><code class="language-{lang}">'
+        separator = ''
+        for line in code_lines:
+            yield separator + escape_html(line)
+            separator = '<br>'
+        yield '</code></pre>'
+    elif kind == 'table':
+        yield render_table(data, tables)
+    elif kind == 'hr':
+        yield '<hr>'
+    else:
+        raise ValueError(f'未知的块类型: {kind}')
+
+def make_anchor(title, anchors):
+    # 规则与 GitHub 相同：去掉标点、转小写、空格换成连字符；同一文档内重名时依次加 -1、-2 后缀
+    slug = ANCHOR_STRIP_RE.sub('', title).strip().lower().replace(' ', '-') or 'section'
+    anchor = slug
+    n = 0
+    while anchor in anchors:
+        n += 1
+        anchor = f'{slug}-{n}'
+    anchors.add(anchor)
+    return ANCHOR_PREFIX + anchor
+
+def render_heading(level, html, anchors, outline=None):
+    # html 为已处理行内标记的标题内容；outline 为列表时追加 [级别, 纯文本, 锚点]
+    title = unescape_html(HTML_TAG_RE.sub('', html)).strip()
+    anchor = make_anchor(title, anchors)
+    if outline is not None:
+        outline.append([level, title, anchor])
+    return f'<h{level} id="{anchor}">{html}</h{level}>'
+
+def render_markdown(lines, outline=None, tables=None):
+    # 逐块产出 HTML 片段，块与块之间以换行分隔；标题带锚点 id，outline 为列表时同时收集大纲，
+    # tables 为列表时同时收集大表格的表体(见 render_table)
+    separator = ''
+    anchors = set()
+    for kind, data in tokenize_blocks(lines):
+        # 段落和空行占绝大多数，直接产出，避免为每个块创建生成器
+        if kind == 'paragraph':
+            yield f'{separator}<p>{process_inline(data)}</p>'
+        elif kind == 'blank':
+            yield separator + '<br>'
+        elif kind == 'heading':
+            # 先产出分隔符再登记标题：split_segments 在收到分隔符时切分，登记时已能确定标题所在分段
+            yield separator
+            yield render_heading(data[0], process_inline(data[1]), anchors, outline)
         else:
-            html.append(f'<p>{process_inline(trimmed)}</p>')
-            i += 1
-    
-    return '\n'.join(html)
+            yield separator
+            yield from render_block(kind, data, tables)
+        separator = '\n'
+
+def iter_lines(f):
+    # 与 text.split('\n') 逐行一致：文本为空或以换行结尾时，末尾还有一个空行
+    line = ''
+    for line in f:
+        yield line[:-1] if line.endswith('\n') else line
+    if line == '' or line.endswith('\n'):
+        yield ''
 
-def render_table(table_lines):
+def convert_markdown(text, outline=None, tables=None):
+    return ''.join(render_markdown(text.split('\n'), outline, tables))
+
+def split_table_row(line):
+    return [cell.strip() for cell in line.strip('|').split('|')]
+
+def get_table_align(cell):
+    if cell.endswith(':'):
+        return 'left'
+    if cell.startswith(':'):
+        return 'right'
+    return ''
+
+def find_table_body(table_lines, second_row):
+    # 第二行不是分隔行时表体从第二行开始；否则从第一个完整匹配分隔格式的行之后开始，都不匹配时从第三行开始。
+    # 通常第二行本身就是分隔行，只有它不匹配时才继续向下逐行检查
+    if not all(cell.startswith(('-', ':')) for cell in second_row):
+        return 1
+    if TABLE_SEPARATOR_RE.fullmatch('|'.join(second_row)):
+        return 2
+    for idx in range(2, len(table_lines)):
+        if TABLE_SEPARATOR_RE.fullmatch('|'.join(split_table_row(table_lines[idx]))):
+            return idx + 1
+    return 2
+
+def render_table_rows(table_lines, start, end, styles):
+    # 每行只切分一次，单元格的起始标签按列预先生成
+    html = []
+    append = html.append
+    for line in islice(table_lines, start, end):
+        append('<tr>')
+        for j, cell in enumerate(split_table_row(line)):
+            append(f'{styles[j] if j < len(styles) else "<td >"}{escape_html(cell)}</td>')
+        append('</tr>')
+    return html
+
+def render_table(table_lines, tables=None):
+    # 线性时间：每行只切分一次，表体不生成中间的行列表。tables 为列表且表体行数达到 table_virtual_rows 时，
+    # 表体按列追加到 tables(写入 <文档>.tables.json)，HTML 中只保留表头、前 TABLE_PREVIEW_ROWS 行和
+    # 代表其余行高度的占位行，由阅读器按滚动位置生成可见的行
     if len(table_lines) < 2:
         return ''.join(f'<p>{escape_html(line)}</p>' for line in table_lines)
     
-    rows = []
-    for line in table_lines:
-        cells = [c.strip() for c in line.strip('|').split('|')]
-        rows.append(cells)
-    
-    if len(rows) < 2:
-        return ''.join(f'<p>{escape_html(line)}</p>' for line in table_lines)
-    
-    header_row = rows[0]
-    align = []
-    for cell in header_row:
-        if cell.endswith(':'):
-            align.append('style="text-align:left"')
-        elif cell.startswith(':') and cell.endswith(':'):
-            align.append('style="text-align:center"')
-        elif cell.startswith(':'):
-            align.append('style="text-align:right"')
-        else:
-            align.append('')
-    
-    html = ['<table class="md-table">']
+    header_row = split_table_row(table_lines[0])
+    align = [get_table_align(cell) for cell in header_row]
+    body_start = find_table_body(table_lines, split_table_row(table_lines[1]))
+    body_rows = len(table_lines) - body_start
+    virtual_rows = get_table_virtual_rows() if tables is not None else 0
+    virtual = 0 < virtual_rows <= body_rows
     
+    if virtual:
+        html = [f'<table class="md-table md-table-virtual" data-table="{len(tables)}" data-rows="{body_rows}">']
+    else:
+        html = ['<table class="md-table">']
     html.append('<thead><tr>')
-    for j, cell in enumerate(header_row):
-        style = align[j] if j < len(align) else ''
+    for cell, cell_align in zip(header_row, align):
+        style = f'style="text-align:{cell_align}"' if cell_align else ''
         html.append(f'<th {style}>{escape_html(cell)}</th>')
     html.append('</tr></thead>')
     
-    if len(rows) > 1 and not all(c.startswith('-') or c.startswith(':') for c in rows[1]):
-        body_start = 1
-    else:
-        sep_idx = None
-        for idx in range(1, len(rows)):
-            row_text = '|'.join(rows[idx])
-            if re.match(r'^[\s|:,\-\d]+$', row_text):
-                sep_idx = idx
-                break
-        body_start = (sep_idx + 1) if sep_idx else 2
-    
-    if body_start < len(rows):
+    if body_rows > 0:
+        styles = [f'<td style="text-align:{cell_align}">' if cell_align else '<td >' for cell_align in align]
+        preview_rows = min(TABLE_PREVIEW_ROWS, body_rows) if virtual else body_rows
         html.append('<tbody>')
-        for r in range(body_start, len(rows)):
-            html.append('<tr>')
-            for j, cell in enumerate(rows[r]):
-                style = align[j] if j < len(align) else ''
-                html.append(f'<td {style}>{escape_html(cell)}</td>')
-            html.append('</tr>')
+        html += render_table_rows(table_lines, body_start, body_start + preview_rows, styles)
+        if virtual:
+            columns = collect_table_columns(table_lines, body_start)
+            tables.append({'align': align, 'columns': columns})
+            html.append(f'<tr class="table-spacer" style="--rows:{body_rows - preview_rows}">'
+                        f'<td colspan="{len(columns)}"></td></tr>')
         html.append('</tbody>')
     
     html.append('</table>')
     return '\n'.join(html)
 
-def convert_docx(docx_path):
+def collect_table_columns(table_lines, body_start):
+    # 表体按列存储：每列一个数组，重复的字段名和标签只出现一次；单元格数少于列数的行以 null 补齐
+    columns = []
+    for row_idx, line in enumerate(islice(table_lines, body_start, None)):
+        cells = split_table_row(line)
+        while len(columns) < len(cells):
+            columns.append([None] * row_idx)
+        for column, cell in zip(columns, cells):
+            column.append(cell)
+        for column in columns[len(cells):]:
+            column.append(None)
+    return columns
+
+IMAGE_EXTENSIONS = {
+    'image/png': '.png', 'image/jpeg': '.jpg', 'image/gif': '.gif', 'image/bmp': '.bmp',
+    'image/svg+xml': '.svg', 'image/webp': '.webp', 'image/tiff': '.tiff',
+    'image/x-emf': '.emf', 'image/x-wmf': '.wmf'
+}
+
+def write_asset(data, content_type):
+    # 图片按内容哈希命名，所有文档共用同一份文件；已存在时不再写入
+    name = hash_bytes(data)[:32] + IMAGE_EXTENSIONS.get(content_type, '.bin')
+    asset_path = get_assets_dir() / name
+    if not asset_path.exists():
+        asset_path.parent.mkdir(parents=True, exist_ok=True)
+        # 临时文件名带进程号，并行转换中多个进程写入同一图片时互不干扰
+        tmp_file = asset_path.with_name(f'{name}.{os.getpid()}.tmp')
+        with open(tmp_file, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_file, asset_path)
+    return name
+
+def convert_docx(docx_path, assets=None, outline=None):
+    # 图片写入 reader/assets/，HTML 中以 URL 引用而不是内联 base64；assets 收集引用到的文件名
     try:
         import mammoth
+        
+        def convert_image(image):
+            with image.open() as image_bytes:
+                name = write_asset(image_bytes.read(), image.content_type)
+            if assets is not None and name not in assets:
+                assets.append(name)
+            return {'src': f'assets/{name}'}
+        
         with open(docx_path, 'rb') as docx_file:
-            result = mammoth.convert_to_html(docx_file)
+            result = mammoth.convert_to_html(docx_file, convert_image=mammoth.images.img_element(convert_image))
             html = result.value
             
-            html = post_process_html(html)
+            html = post_process_html(html, outline)
             
             return html
     except ImportError:
@@ -257,238 +949,1590 @@ def convert_docx(docx_path):
         log_error(f'Word 文档转换失败: {e}', 'Sync-DOCX')
         raise
 
-def post_process_html(html):
+def post_process_html(html, outline=None):
     html = html.replace('<table>', '<table class="docx-table">')
-    html = html.replace('<img', '<img class="docx-image"')
+    html = html.replace('<img', '<img class="docx-image" loading="lazy"')
+    anchors = set()
+    html = DOCX_HEADING_RE.sub(lambda m: render_heading(int(m.group(1)), m.group(2), anchors, outline), html)
     return html
 
-def render_content(content, file_path):
+def render_content(content, file_path, assets=None, outline=None, tables=None):
     try:
         if file_path.suffix == '.md':
-            return convert_markdown(content)
+            return convert_markdown(content, outline, tables)
         elif file_path.suffix == '.docx':
-            return convert_docx(file_path)
+            return convert_docx(file_path, assets, outline)
         else:
-            return convert_markdown(content)
+            return convert_markdown(content, outline, tables)
     except Exception as e:
         log_error(f'内容渲染失败: {file_path} - {e}', 'Sync-Render')
         raise
 
-def scan_directory(source_dir, root_dir=None):
-    if root_dir is None:
-        root_dir = source_dir
-    items = []
+def build_inventory(source_dir, verbose=True):
+    # 单次 os.scandir 遍历源目录，缓存 stat 结果和排除判定，供扫描、清理、转换阶段共用
     source_path = Path(source_dir)
-    if not source_path.exists():
-        return []
+    tree = {'name': source_path.name, 'rel_key': '', 'dirs': [], 'files': []}
+    files = []
+    if source_path.exists():
+        walk_inventory(source_path, '', tree, files, verbose)
+    return {'root_dir': source_path, 'tree': tree, 'files': files}
+
+def walk_inventory(dir_path, rel_prefix, node, files, verbose=True):
+    dirs, records = list_directory(dir_path, rel_prefix, verbose)
+    for name, rel_key, path in dirs:
+        child = {'name': name, 'rel_key': rel_key, 'dirs': [], 'files': []}
+        walk_inventory(path, rel_key + '/', child, files, verbose)
+        node['dirs'].append(child)
+    node['files'].extend(records)
+    files.extend(records)
+
+def list_directory(dir_path, rel_prefix, verbose=True):
+    # 列出一层目录，目录在前、按名称排序：返回未排除的子目录 (名称, 相对路径, 路径) 和文件记录
+    try:
+        with os.scandir(dir_path) as it:
+            entries = sorted(it, key=lambda e: (e.is_file(), e.name))
+    except OSError as e:
+        log_error(f'读取目录失败: {dir_path} - {e}', 'Sync-Scan')
+        return [], []
     
-    for path in sorted(source_path.iterdir(), key=lambda x: (x.is_file(), x.name)):
-        if should_skip(path):
+    dirs = []
+    files = []
+    for entry in entries:
+        if should_skip(entry):
             continue
-        if path.is_dir():
-            children = scan_directory(path, root_dir)
-            if children:
-                items.append({'type': 'folder', 'name': path.name, 'children': children})
-        elif path.is_file():
-            if should_exclude(path, root_dir):
-                log_info(f'排除: {path.relative_to(root_dir)}', 'Sync-Scan')
+        rel_key = rel_prefix + entry.name
+        if entry.is_dir():
+            if should_exclude_dir(rel_key, entry.name):
+                if verbose:
+                    log_detail(f'排除目录: {rel_key}', 'Sync-Scan')
                 continue
-            if path.suffix in ['.txt', '.md', '.docx']:
-                rel_path = path.relative_to(root_dir)
-                ext = path.suffix
-                output_path = str(rel_path).replace('\\', '/')
-                if ext != '.txt':
-                    output_path = str(rel_path.with_suffix('.html')).replace('\\', '/')
-                items.append({
-                    'type': 'file',
-                    'name': path.name,
-                    'path': output_path,
-                    'title': path.stem.replace('-', ' ').replace('_', ' ')
-                })
+            dirs.append((entry.name, rel_key, entry.path))
+        elif entry.is_file():
+            files.append(make_file_record(Path(entry.path), rel_key, entry.stat(), verbose))
+    return dirs, files
+
+def make_file_record(path, rel_key, stat, verbose=True):
+    return {
+        'path': path,
+        'name': path.name,
+        'rel_key': rel_key,
+        'suffix': path.suffix,
+        'stat': stat,
+        'excluded': should_exclude_file(rel_key, path.name, path.suffix, verbose)
+    }
+
+def get_source_record(source_dir, rel_key, verbose=True):
+    # 按 walk_inventory 的跳过和排除规则检查单个源文件；文件不存在或所在目录被排除时返回 None
+    parts = rel_key.split('/')
+    prefix = ''
+    for name in parts[:-1]:
+        if should_skip(Path(name)) or should_exclude_dir(prefix + name, name):
+            return None
+        prefix += name + '/'
+    path = Path(source_dir) / rel_key
+    if should_skip(path) or not path.is_file():
+        return None
+    return make_file_record(path, rel_key, path.stat(), verbose)
+
+def get_output_rel(rel_key):
+    if rel_key.endswith('.txt') and not get_prerender_txt():
+        return rel_key
+    return os.path.splitext(rel_key)[0] + '.html'
+
+def render_markdown_file(path, dest_path, outline=None, tables=None):
+    # 流式渲染：逐行读取、逐块写出，峰值内存与文件大小无关
+    try:
+        with open(path, 'r', encoding='utf-8') as src:
+            return write_output(dest_path, render_markdown(iter_lines(src), outline, tables))
+    except Exception as e:
+        log_error(f'内容渲染失败: {path} - {e}', 'Sync-Render')
+        raise
+
+def get_segment_dir(dest_path):
+    return dest_path.with_name(dest_path.stem + SEGMENT_DIR_SUFFIX)
+
+def split_segments(pieces, segment_size, outline=None):
+    # 只在块边界切分：render_markdown 产出的片段以换行开头即表示新块开始，切分时去掉该换行。
+    # outline 为 render_markdown 正在收集的大纲，切分时为已登记的标题补上所在分段序号
+    buffer = []
+    size = 0
+    index = 0
+    tagged = 0
+    for piece in pieces:
+        if size >= segment_size and piece.startswith('\n'):
+            if outline is not None:
+                tagged = tag_outline(outline, tagged, index)
+            yield ''.join(buffer)
+            index += 1
+            buffer = [piece[1:]]
+            size = len(piece) - 1
+        else:
+            buffer.append(piece)
+            size += len(piece)
+    if outline is not None:
+        tag_outline(outline, tagged, index)
+    yield ''.join(buffer)
+
+def tag_outline(outline, start, index):
+    for entry in outline[start:]:
+        entry.append(index)
+    return len(outline)
+
+def get_outline_file(dest_path):
+    return dest_path.with_name(dest_path.stem + OUTLINE_SUFFIX)
+
+def write_outline(dest_path, outline):
+    """
+    大纲旁路文件 <文档>.outline.json：headings 为 [级别, 纯文本, 锚点, 分段序号] 列表，阅读器据此
+    生成目录并跳转，不需要加载和解析整篇文档。没有标题时删除旧文件。返回内容哈希前 16 位或 None
+    """
+    outline_file = get_outline_file(dest_path)
+    if not outline:
+        outline_file.unlink(missing_ok=True)
+        remove_compressed(outline_file)
+        return None
+    for entry in outline:
+        if len(entry) == 3:
+            entry.append(0)
+    data = json.dumps({'version': OUTLINE_VERSION, 'headings': outline}, ensure_ascii=False, separators=(',', ':'))
+    return write_output(outline_file, data)[0][:16]
+
+def get_tables_file(dest_path):
+    return dest_path.with_name(dest_path.stem + TABLES_SUFFIX)
+
+def write_tables(dest_path, tables):
+    """
+    大表格旁路文件 <文档>.tables.json：tables 中每个表格为 {align, columns}，columns 按列存储全部表体单元格，
+    文档中 data-table 属性为表格在此列表中的序号。没有大表格时删除旧文件。返回内容哈希前 16 位或 None
+    """
+    tables_file = get_tables_file(dest_path)
+    if not tables:
+        tables_file.unlink(missing_ok=True)
+        remove_compressed(tables_file)
+        return None
+    data = json.dumps({'version': TABLES_VERSION, 'tables': tables}, ensure_ascii=False, separators=(',', ':'))
+    return write_output(tables_file, data)[0][:16]
+
+def render_segmented_file(path, dest_path, segment_size, outline=None, tables=None):
+    """
+    预渲染 TXT：逐行读取并渲染，输出超过 segment_size 个字符时分段。
+    首段写入 dest_path，末尾附带指向分段清单的占位元素；其余分段写入 <文档>.segments/<n>.html，
+    清单 index.json 记录每段的内容哈希。返回 (首段文件的写入结果, 相对 dest_path 所在目录的分段文件列表)
+    """
+    segment_dir = get_segment_dir(dest_path)
+    entries = []
+    with open(path, 'r', encoding='utf-8') as src:
+        segments = split_segments(render_markdown(iter_lines(src), outline, tables), segment_size, outline)
+        first = next(segments)
+        for index, html in enumerate(segments, 1):
+            if not entries:
+                segment_dir.mkdir(exist_ok=True)
+            name = f'{index}.html'
+            content_hash, _ = write_output(segment_dir / name, html)
+            entries.append({'file': name, 'hash': content_hash[:16]})
+    
+    if not entries:
+        if segment_dir.exists():
+            shutil.rmtree(segment_dir)
+        return write_output(dest_path, first), []
+    
+    manifest = json.dumps({'version': SEGMENT_VERSION, 'segments': entries}, separators=(',', ':')).encode('utf-8')
+    write_output(segment_dir / 'index.json', manifest)
+    keep = {entry['file'] for entry in entries} | {'index.json'}
+    with os.scandir(segment_dir) as it:
+        for entry in it:
+            name = entry.name[:-3] if entry.name.endswith(('.gz', '.br')) else entry.name
+            if name not in keep:
+                os.unlink(entry.path)
+    
+    manifest_url = escape_html(f'{segment_dir.name}/index.json?v={hash_bytes(manifest)[:16]}').replace('"', '&quot;')
+    marker = f'\n<div class="doc-segments" data-manifest="{manifest_url}" data-count="{len(entries)}"></div>'
+    return write_output(dest_path, (first, marker)), [f'{segment_dir.name}/{name}' for name in sorted(keep)]
+
+def scan_directory(inventory, node=None):
+    if node is None:
+        node = inventory['tree']
+    items = []
+    for child in node['dirs']:
+        children = scan_directory(inventory, child)
+        if children:
+            items.append({'type': 'folder', 'name': child['name'], 'children': children})
+    for record in node['files']:
+        if record['excluded']:
+            log_detail(f'排除: {record["rel_key"]}', 'Sync-Scan')
+            continue
+        items.append(make_nav_file_item(record))
     return items
 
-def cleanup_orphaned_files(source_dir, dest_dir):
-    source_path = Path(source_dir)
+def make_nav_file_item(record):
+    return {
+        'type': 'file',
+        'name': record['name'],
+        'path': get_output_rel(record['rel_key']),
+        'title': get_doc_title(record['name'])
+    }
+
+def get_doc_title(name):
+    return os.path.splitext(name)[0].replace('-', ' ').replace('_', ' ')
+
+def cleanup_orphaned_files(inventory, dest_dir):
     dest_path = Path(dest_dir)
     
     if not dest_path.exists():
         return
     
-    valid_files = set()
-    for path in source_path.rglob('*.txt'):
-        rel_path = path.relative_to(source_path)
-        valid_files.add(str(rel_path))
-    
-    for path in source_path.rglob('*.md'):
-        rel_path = path.relative_to(source_path)
-        valid_files.add(str(rel_path.with_suffix('.html')))
-    
-    for path in source_path.rglob('*.docx'):
-        rel_path = path.relative_to(source_path)
-        valid_files.add(str(rel_path.with_suffix('.html')))
+    valid_files = {get_output_rel(record['rel_key']) for record in inventory['files'] if not record['excluded']}
+    deleted_count = prune_orphaned_outputs(dest_path, '', valid_files)
     
+    if deleted_count > 0:
+        log_info(f'清理完成，共删除 {deleted_count} 个文件', 'Sync-Cleanup')
+
+def is_orphaned_output(rel_str, valid_files):
+    # 预压缩副本(.gz/.br)随对应的 HTML/TXT 一起清理，分段目录、大纲和大表格文件随所属文档一起清理
+    if rel_str.endswith(('.gz', '.br')):
+        rel_str = rel_str[:-3]
+    for suffix in (OUTLINE_SUFFIX, TABLES_SUFFIX):
+        if rel_str.endswith(suffix):
+            return rel_str[:-len(suffix)] + '.html' not in valid_files
+    parent = rel_str.rpartition('/')[0]
+    if parent.endswith(SEGMENT_DIR_SUFFIX):
+        return parent[:-len(SEGMENT_DIR_SUFFIX)] + '.html' not in valid_files
+    return rel_str.endswith(('.html', '.txt')) and rel_str not in valid_files
+
+def prune_orphaned_outputs(dir_path, rel_prefix, valid_files):
+    # 单次遍历输出目录：删除孤立的 HTML/TXT 文件，并自底向上删除空目录
     deleted_count = 0
-    for html_file in dest_path.rglob('*.html'):
-        rel_path = html_file.relative_to(dest_path)
-        rel_str = str(rel_path).replace('\\', '/')
-        if rel_str not in valid_files:
+    with os.scandir(dir_path) as it:
+        entries = list(it)
+    for entry in entries:
+        rel_str = rel_prefix + entry.name
+        if entry.is_dir(follow_symlinks=False):
+            deleted_count += prune_orphaned_outputs(entry.path, rel_str + '/', valid_files)
             try:
-                html_file.unlink()
-                log_info(f'删除: {rel_str}', 'Sync-Cleanup')
-                deleted_count += 1
-            except Exception as e:
-                log_error(f'删除文件失败: {rel_str} - {e}', 'Sync-Cleanup')
-    
-    for txt_file in dest_path.rglob('*.txt'):
-        rel_path = txt_file.relative_to(dest_path)
-        rel_str = str(rel_path).replace('\\', '/')
-        if rel_str not in valid_files:
+                os.rmdir(entry.path)
+                log_detail(f'删除空目录: {rel_str}', 'Sync-Cleanup')
+            except OSError:
+                pass
+        elif is_orphaned_output(rel_str, valid_files):
             try:
-                txt_file.unlink()
-                log_info(f'删除: {rel_str}', 'Sync-Cleanup')
+                os.unlink(entry.path)
+                log_detail(f'删除: {rel_str}', 'Sync-Cleanup')
                 deleted_count += 1
             except Exception as e:
                 log_error(f'删除文件失败: {rel_str} - {e}', 'Sync-Cleanup')
+    return deleted_count
+
+def convert_file(path, dest_path, stream=False, index_terms=False, site=None):
+    # 可能在工作进程中执行：异常在此处捕获并作为结果返回，单个文档失败不会影响进程池。
+    # Builder 的进程池跨站点复用，site 携带提交任务时的站点配置和目录
+    if site is not None:
+        use_site(**site)
+    start = time.perf_counter()
+    cpu_start = time.process_time()
+    assets = []
+    segments = []
+    outline = []
+    tables = []
+    try:
+        # 输出经 write_output 原子写入，渲染结果与已有文件相同时不改写
+        if path.suffix == '.txt':
+            (output_hash, written), segments = render_segmented_file(path, dest_path, get_txt_segment_size(), outline,
+                                                                     tables)
+        elif path.suffix == '.md' and stream:
+            output_hash, written = render_markdown_file(path, dest_path, outline, tables)
+        else:
+            if path.suffix == '.md':
+                with open(path, 'r', encoding='utf-8') as f:
+                    content = f.read()
+                html = render_content(content, path, outline=outline, tables=tables)
+            else:
+                html = render_content('', path, assets, outline)
+            output_hash, written = write_output(dest_path, html)
+        outline_hash = write_outline(dest_path, outline)
+        tables_hash = write_tables(dest_path, tables)
+        terms = collect_terms(path, dest_path) if index_terms else None
+        return {
+            'error': None,
+            'output_hash': output_hash,
+            'written': written,
+            'output_bytes': dest_path.stat().st_size,
+            'terms': terms,
+            'assets': assets,
+            'segments': segments,
+            'outline': outline_hash,
+            'tables': tables_hash,
+            'seconds': time.perf_counter() - start,
+            'cpu': time.process_time() - cpu_start
+        }
+    except Exception as e:
+        if dest_path.exists():
+            dest_path.unlink()
+        return conversion_error(e)
+
+def conversion_error(e):
+    return {'error': str(e) or e.__class__.__name__}
+
+def run_conversions(tasks, jobs=1, get_executor=None):
+    # tasks 可以是生成器(定向同步的流水线模式下随下载逐个产生)，按 (task, 结果) 依次返回。
+    # get_executor 返回调用方持有的进程池(Builder.get_executor，进程池损坏后重新创建)，否则按 jobs 临时创建
+    tasks = iter(tasks)
+    head = list(islice(tasks, 2))
+    if jobs <= 1 or len(head) <= 1:
+        for task in chain(head, tasks):
+            yield task, convert_file(task['path'], task['dest_path'], task['stream'], task['index_terms'])
+        return
     
-    def remove_empty_dirs(dir_path):
-        for child in sorted(dir_path.iterdir(), reverse=True):
-            if child.is_dir():
-                remove_empty_dirs(child)
-                try:
-                    child.rmdir()
-                    log_info(f'删除空目录: {child.relative_to(dest_path)}', 'Sync-Cleanup')
-                except OSError:
-                    pass
+    tasks = chain(head, tasks)
+    if get_executor is not None:
+        log_info('并行转换: 共享进程池', 'Sync-Core')
+        yield from collect_conversions(get_executor, tasks, 2 * jobs, get_site())
+        return
+    log_info(f'并行转换: {jobs} 个进程', 'Sync-Core')
+    pools = []
     
-    remove_empty_dirs(dest_path)
+    def get_pool():
+        # 工作进程异常退出后进程池不可再用，关闭后创建新的进程池
+        if pools and pools[-1]._broken:
+            pools.pop().shutdown(wait=False)
+        if not pools:
+            pools.append(ProcessPoolExecutor(max_workers=jobs))
+        return pools[-1]
     
-    if deleted_count > 0:
-        log_info(f'清理完成，共删除 {deleted_count} 个文件', 'Sync-Cleanup')
+    try:
+        yield from collect_conversions(get_pool, tasks, 2 * jobs)
+    finally:
+        for pool in pools:
+            pool.shutdown()
 
-def copy_and_convert_files(source_dir, dest_dir):
-    dest_dir.mkdir(parents=True, exist_ok=True)
-    source_path = Path(source_dir)
+def collect_conversions(get_executor, tasks, window, site=None):
+    # 在途任务达到 window 个时先等待其中任意一个完成再取下一个任务，tasks 为生成器时由此向上游施加背压。
+    # 结果按完成顺序返回：清单、搜索索引和目录索引写出前都会排序，与串行执行的结果相同。
+    # 一个工作进程异常退出(内存不足、转换库崩溃)会使进程池中所有在途任务以 BrokenProcessPool 失败：
+    # 这些任务经 get_executor 取得新的进程池后逐个单独重试，再次导致进程退出的任务才记为转换失败
+    pending = {}
+    crashed = []
     
-    txt_count = 0
-    md_count = 0
-    docx_count = 0
-    error_count = 0
+    def submit(executor, task):
+        return executor.submit(convert_file, task['path'], task['dest_path'], task['stream'], task['index_terms'], site)
     
-    for path in source_path.rglob('*.txt'):
-        if should_exclude(path, source_path):
-            continue
-        rel_path = path.relative_to(source_path)
-        dest_path = dest_dir / rel_path
-        dest_path.parent.mkdir(parents=True, exist_ok=True)
-        if dest_path.exists() and dest_path.stat().st_mtime >= path.stat().st_mtime:
-            log_info(f'跳过(未修改): {rel_path}', 'Sync-TXT')
-        else:
+    def finish(futures):
+        for future in futures:
+            task = pending.pop(future)
             try:
-                shutil.copy2(path, dest_path)
-                log_info(f'复制: {rel_path}', 'Sync-TXT')
-                txt_count += 1
+                result = future.result()
+            except BrokenProcessPool:
+                crashed.append(task)
             except Exception as e:
-                log_error(f'复制失败: {rel_path} - {e}', 'Sync-TXT')
-                error_count += 1
+                yield task, conversion_error(e)
+            else:
+                add_worker_cpu(result)
+                yield task, result
     
-    for path in source_path.rglob('*.md'):
-        if should_exclude(path, source_path):
-            continue
-        rel_path = path.relative_to(source_path)
-        dest_path = dest_dir / rel_path.with_suffix('.html')
-        dest_path.parent.mkdir(parents=True, exist_ok=True)
-        if dest_path.exists() and dest_path.stat().st_mtime >= path.stat().st_mtime:
-            log_info(f'跳过(未修改): {rel_path}', 'Sync-MD')
-        else:
+    def retry_crashed():
+        # 其余在途任务同样以 BrokenProcessPool 结束(崩溃前已完成的正常返回)，之后逐个重试
+        yield from finish(list(pending))
+        log_error(f'转换进程异常退出，逐个重试 {len(crashed)} 个文件', 'Sync-Core')
+        while crashed:
+            task = crashed.pop(0)
             try:
-                with open(path, 'r', encoding='utf-8') as f:
-                    content = f.read()
-                html = render_content(content, path)
-                with open(dest_path, 'w', encoding='utf-8') as f:
-                    f.write(html)
-                log_info(f'转换: {rel_path} → {rel_path.with_suffix(".html")}', 'Sync-MD')
-                md_count += 1
+                result = submit(get_executor(), task).result()
+            except BrokenProcessPool:
+                result = conversion_error(RuntimeError('转换进程异常退出'))
             except Exception as e:
-                if dest_path.exists():
-                    dest_path.unlink()
-                log_error(f'转换失败: {rel_path} - {e}', 'Sync-MD')
-                error_count += 1
+                result = conversion_error(e)
+            add_worker_cpu(result)
+            yield task, result
+    
+    for task in tasks:
+        if len(pending) >= window:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            yield from finish(done)
+        if crashed:
+            yield from retry_crashed()
+        try:
+            pending[submit(get_executor(), task)] = task
+        except BrokenProcessPool:
+            crashed.append(task)
+    for future in as_completed(list(pending)):
+        yield from finish([future])
+    if crashed:
+        yield from retry_crashed()
+
+def get_conversion_key(suffix, source_hash, converter):
+    # 跨站点复用的转换结果键：DOCX 的输出只取决于源内容和转换器，MD 还取决于大表格的行数阈值，
+    # TXT 预渲染还取决于分段大小和大表格的行数阈值
+    if suffix == '.txt':
+        return (converter, source_hash, get_txt_segment_size(), get_table_virtual_rows())
+    if suffix == '.md':
+        return (converter, source_hash, get_table_virtual_rows())
+    return (converter, source_hash)
+
+def reuse_conversion(cached, path, dest_path, index_terms):
+    # 其他站点已转换过相同内容时复制其输出和大纲；这些文件之后被改写或删除则返回 None 重新转换
+    output_path, output_hash, terms, outline_hash = cached
+    try:
+        if hash_file(output_path) != output_hash:
+            return None
+        if outline_hash and hash_file(get_outline_file(output_path))[:16] != outline_hash:
+            return None
+        method = publish_file(output_path, dest_path, output_hash) if output_path != dest_path else 'unchanged'
+        if outline_hash and output_path != dest_path:
+            outline_file = get_outline_file(output_path)
+            publish_file(outline_file, get_outline_file(dest_path), hash_file(outline_file))
+        elif not outline_hash:
+            get_outline_file(dest_path).unlink(missing_ok=True)
+        # 带大表格文件的输出不参与复用，本站点旧的大表格文件随之失效
+        get_tables_file(dest_path).unlink(missing_ok=True)
+    except OSError:
+        return None
+    if index_terms and terms is None:
+        terms = collect_terms(path, dest_path)
+    return {'method': method, 'terms': terms}
+
+def copy_and_convert_files(inventory, dest_dir, jobs=1, changed=None, previous=None, get_executor=None,
+                           conversions=None):
+    # 监听模式传入 changed(变化的源文件)和 previous(上次的清单与分词结果)：
+    # 未变化的文件直接沿用上次的条目，不读取也不计算哈希。
+    # Builder 传入 get_executor(共享的进程池)和 conversions(跨站点的转换结果缓存)。
+    # inventory['files'] 为列表时按 TXT、MD、DOCX 的顺序处理；定向同步的流水线模式下为生成器，
+    # 文件按到达顺序逐个提交转换
+    dest_dir.mkdir(parents=True, exist_ok=True)
+    
+    index_terms = get_full_text_search()
+    if previous is not None:
+        manifest, search_cache = previous[0], previous[1] or {}
+    else:
+        manifest = load_manifest()
+        search_cache = load_search_cache() if index_terms else {}
+    new_manifest = {}
+    config_fp = get_config_fingerprint()
+    search_docs = {}
+    
+    counts = {'.txt': 0, '.md': 0, '.docx': 0, 'error': 0}
+    
+    suffix_order = {'.txt': 0, '.md': 1, '.docx': 2}
+    records = (r for r in inventory['files'] if not r['excluded'])
+    if isinstance(inventory['files'], list):
+        records = sorted(records, key=lambda r: suffix_order[r['suffix']])
+    
+    stream_threshold = get_stream_render_threshold()
+    prerender_txt = get_prerender_txt()
+    txt_publish = get_txt_publish()
+    created_dirs = set()
+    
+    def iter_tasks():
+        for record in records:
+            suffix = record['suffix']
+            module = CONVERT_MODULES[suffix]
+            path = record['path']
+            rel_key = record['rel_key']
+            if changed is not None and rel_key not in changed and rel_key in manifest \
+                    and (not index_terms or rel_key in search_cache):
+                new_manifest[rel_key] = manifest[rel_key]
+                if index_terms:
+                    search_docs[rel_key] = search_cache[rel_key]
+                count_metric('manifest.hit')
+                continue
+            rel_path = Path(rel_key)
+            output_rel = get_output_rel(rel_key)
+            dest_path = dest_dir / output_rel
+            if dest_path.parent not in created_dirs:
+                dest_path.parent.mkdir(parents=True, exist_ok=True)
+                created_dirs.add(dest_path.parent)
+            source_hash = hash_file(path)
+            converter = get_converter_version(suffix)
+            if is_up_to_date(manifest.get(rel_key), source_hash, dest_path, converter, config_fp):
+                log_detail(f'跳过(未修改): {rel_path}', module)
+                count_metric('manifest.hit')
+                new_manifest[rel_key] = manifest[rel_key]
+                if index_terms:
+                    cached = search_cache.get(rel_key)
+                    if cached is not None and cached['source_hash'] == source_hash:
+                        search_docs[rel_key] = cached
+                        count_metric('search_cache.hit')
+                    else:
+                        search_docs[rel_key] = {'source_hash': source_hash, 'terms': collect_terms(path, dest_path)}
+                        count_metric('search_cache.miss')
+                entry = manifest[rel_key]
+                if conversions is not None and not entry.get('assets') and not entry.get('segments') \
+                        and not entry.get('tables') and (suffix != '.txt' or prerender_txt):
+                    conversions[get_conversion_key(suffix, source_hash, converter)] = (
+                        dest_path, entry['output_hash'], search_docs[rel_key]['terms'] if index_terms else None,
+                        entry.get('outline'))
+                continue
+            count_metric('manifest.miss')
+            
+            if suffix == '.txt' and not prerender_txt:
+                try:
+                    start = time.perf_counter()
+                    method = publish_file(path, dest_path, source_hash, txt_publish)
+                    count_metric(f'txt.{method}')
+                    log_detail(f'复制: {rel_path}' if method != 'unchanged' else f'复制(内容相同，未写入): {rel_path}',
+                               module)
+                    new_manifest[rel_key] = make_manifest_entry(source_hash, source_hash, output_rel, converter,
+                                                                config_fp)
+                    if index_terms:
+                        search_docs[rel_key] = {'source_hash': source_hash, 'terms': collect_terms(path, dest_path)}
+                    size = record['stat'].st_size
+                    record_file_metric(rel_key, 'copy', time.perf_counter() - start, size, size)
+                    counts['.txt'] += 1
+                except Exception as e:
+                    log_error(f'复制失败: {rel_path} - {e}', module)
+                    counts['error'] += 1
+                continue
+            
+            if conversions is not None:
+                cached = conversions.get(get_conversion_key(suffix, source_hash, converter))
+                start = time.perf_counter()
+                reused = reuse_conversion(cached, path, dest_path, index_terms) if cached is not None else None
+                if reused is not None:
+                    log_detail(f'复用: {rel_path} → {output_rel}', module)
+                    count_metric('conversion_cache.hit')
+                    count_metric('output.written' if reused['method'] != 'unchanged' else 'output.unchanged')
+                    new_manifest[rel_key] = make_manifest_entry(source_hash, cached[1], output_rel, converter,
+                                                                config_fp, outline=cached[3])
+                    if index_terms:
+                        search_docs[rel_key] = {'source_hash': source_hash, 'terms': reused['terms']}
+                    record_file_metric(rel_key, 'reuse', time.perf_counter() - start, record['stat'].st_size,
+                                       dest_path.stat().st_size)
+                    counts[suffix] += 1
+                    continue
+                count_metric('conversion_cache.miss')
+            
+            yield {
+                'path': path,
+                'rel_path': rel_path,
+                'rel_key': rel_key,
+                'output_rel': output_rel,
+                'dest_path': dest_path,
+                'source_hash': source_hash,
+                'converter': converter,
+                'input_bytes': record['stat'].st_size,
+                'stream': record['stat'].st_size >= stream_threshold,
+                'index_terms': index_terms
+            }
     
-    for path in source_path.rglob('*.docx'):
-        if should_exclude(path, source_path):
+    for task, result in run_conversions(iter_tasks(), jobs, get_executor):
+        rel_path = task['rel_path']
+        module = CONVERT_MODULES[rel_path.suffix]
+        if result['error'] is not None:
+            log_error(f'转换失败: {rel_path} - {result["error"]}', module)
+            count_metric('convert.error')
+            counts['error'] += 1
             continue
-        rel_path = path.relative_to(source_path)
-        dest_path = dest_dir / rel_path.with_suffix('.html')
-        dest_path.parent.mkdir(parents=True, exist_ok=True)
-        if dest_path.exists() and dest_path.stat().st_mtime >= path.stat().st_mtime:
-            log_info(f'跳过(未修改): {rel_path}', 'Sync-DOCX')
-        else:
-            try:
-                html = render_content('', path)
-                with open(dest_path, 'w', encoding='utf-8') as f:
-                    f.write(html)
-                log_info(f'转换: {rel_path} → {rel_path.with_suffix(".html")}', 'Sync-DOCX')
-                docx_count += 1
-            except Exception as e:
-                if dest_path.exists():
-                    dest_path.unlink()
-                log_error(f'转换失败: {rel_path} - {e}', 'Sync-DOCX')
-                error_count += 1
+        log_detail(f'转换: {rel_path} → {task["output_rel"]}' + ('' if result['written'] else ' (内容相同，未写入)'), module)
+        count_metric('output.written' if result['written'] else 'output.unchanged')
+        record_file_metric(task['rel_key'], 'convert', result['seconds'], task['input_bytes'], result['output_bytes'])
+        new_manifest[task['rel_key']] = make_manifest_entry(
+            task['source_hash'], result['output_hash'], task['output_rel'], task['converter'], config_fp,
+            result['assets'], result['segments'], result['outline'], result['tables'])
+        if index_terms:
+            search_docs[task['rel_key']] = {'source_hash': task['source_hash'], 'terms': result['terms']}
+        # 引用图片、分段或大表格文件的输出依赖本站点的其他文件，不参与跨站点复用
+        if conversions is not None and not result['assets'] and not result['segments'] and not result['tables']:
+            conversions[get_conversion_key(rel_path.suffix, task['source_hash'], task['converter'])] = (
+                task['dest_path'], result['output_hash'], result['terms'], result['outline'])
+        counts[rel_path.suffix] += 1
     
-    log_info(f'文件处理完成: TXT={txt_count}, MD={md_count}, DOCX={docx_count}, ERROR={error_count}', 'Sync-Core')
+    # 监听模式下清单和分词缓存只保存在内存中，停止监听时再写入磁盘
+    if changed is None:
+        save_manifest(new_manifest)
+        if index_terms:
+            save_search_cache(search_docs)
+    log_info(f'文件处理完成: TXT={counts[".txt"]}, MD={counts[".md"]}, DOCX={counts[".docx"]}, ERROR={counts["error"]}',
+             'Sync-Core')
+    return new_manifest, (search_docs if index_terms else None)
 
-def generate_index(items, output_file):
+def prune_orphaned_assets(manifest, candidates=None):
+    # 删除不再被任何文档引用的图片；candidates 为可能失去引用的图片名，给出时不遍历图片目录
+    assets_dir = get_assets_dir()
+    if not assets_dir.exists():
+        return
+    referenced = {name for entry in manifest.values() for name in entry.get('assets', ())}
+    deleted_count = 0
+    if candidates is not None:
+        for name in set(candidates) - referenced:
+            if (assets_dir / name).exists():
+                (assets_dir / name).unlink()
+                deleted_count += 1
+    else:
+        with os.scandir(assets_dir) as it:
+            for entry in it:
+                if entry.is_file() and entry.name not in referenced:
+                    os.unlink(entry.path)
+                    deleted_count += 1
+    if deleted_count > 0:
+        log_info(f'删除未引用的图片: {deleted_count} 个', 'Sync-Cleanup')
+
+def get_nav_id(rel_key):
+    return hash_bytes(rel_key.encode('utf-8'))[:16]
+
+def write_nav_shard(nav_file, entries):
+    # 逐项序列化写入临时文件并同时计算哈希，内容未变化时保留原文件
+    digest = hashlib.sha256()
+    tmp_file = nav_file.with_name(nav_file.name + '.tmp')
+    with open(tmp_file, 'wb') as f:
+        separator = b'['
+        for entry in entries:
+            chunk = separator + json.dumps(entry, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+            digest.update(chunk)
+            f.write(chunk)
+            separator = b','
+        chunk = b']' if separator == b',' else b'[]'
+        digest.update(chunk)
+        f.write(chunk)
+    content_hash = digest.hexdigest()
+    if nav_file.exists() and hash_file(nav_file) == content_hash:
+        tmp_file.unlink()
+        return content_hash[:16], False
+    os.replace(tmp_file, nav_file)
+    return content_hash[:16], True
+
+def write_nav_folder(item, parent_rel, nav_dir, written, versions, cache=None, dirty=None):
+    # 后序遍历：子目录先写出，父目录分片中的存根带有子目录的内容哈希。
+    # cache 保存每个目录的存根及其子树分片 ID，dirty 之外的目录直接复用缓存，不再序列化
+    rel_key = f'{parent_rel}/{item["name"]}' if parent_rel else item['name']
+    if dirty is not None and rel_key not in dirty and rel_key in cache:
+        stub, subtree = cache[rel_key]
+        written.update(dict.fromkeys(subtree, False))
+        return stub
+    nav_id = get_nav_id(rel_key)
+    subtree = [nav_id]
+    entries = []
+    total_files = 0
+    for child in item['children']:
+        if child['type'] == 'folder':
+            stub = write_nav_folder(child, rel_key, nav_dir, written, versions, cache, dirty)
+            if cache is not None:
+                subtree.extend(cache[f'{rel_key}/{child["name"]}'][1])
+            total_files += stub['files']
+            entries.append(stub)
+        else:
+            total_files += 1
+            version = versions.get(child['path'])
+            entries.append(dict(child, **version) if version else child)
+    content_hash, changed = write_nav_shard(nav_dir / f'{nav_id}.json', entries)
+    written[nav_id] = changed
+    stub = {'type': 'folder', 'name': item['name'], 'id': nav_id, 'hash': content_hash, 'files': total_files}
+    if cache is not None:
+        cache[rel_key] = (stub, subtree)
+    return stub
+
+def get_nav_versions(manifest):
+    # 文件条目附带的版本字段：v 为文档内容哈希，o 为大纲文件的内容哈希(文档有标题时)，
+    # t 为大表格文件的内容哈希(文档有大表格时)
+    versions = {}
+    for entry in manifest.values():
+        version = {'v': entry['output_hash'][:16]}
+        if entry.get('outline'):
+            version['o'] = entry['outline']
+        if entry.get('tables'):
+            version['t'] = entry['tables']
+        versions[entry['output']] = version
+    return versions
+
+def generate_index(items, output_file, versions=None, cache=None, dirty=None):
+    # 根清单只包含顶层目录的存根，每个目录的直接子项写入 nav/<id>.json，前端展开目录时再加载。
+    # versions(输出路径 -> 版本字段，见 get_nav_versions)写入文件条目，前端据此以 ?v=<哈希> 请求文档和大纲
+    nav_dir = output_file.parent / 'nav'
     try:
-        with open(output_file, 'w', encoding='utf-8') as f:
-            json.dump(items, f, ensure_ascii=False, indent=2)
-        log_info(f'生成索引: {output_file}', 'Sync-Index')
+        nav_dir.mkdir(parents=True, exist_ok=True)
+        written = {}
+        stubs = [write_nav_folder(item, '', nav_dir, written, versions or {}, cache, dirty) for item in items]
+        
+        for nav_file in nav_dir.glob('*.json'):
+            if nav_file.stem not in written:
+                nav_file.unlink()
+        
+        write_output(output_file, json.dumps({'version': NAV_VERSION, 'items': stubs},
+                                             ensure_ascii=False, separators=(',', ':')))
+        count_metric('nav.written', sum(written.values()))
+        count_metric('nav.unchanged', len(written) - sum(written.values()))
+        log_info(f'生成索引: {output_file} ({len(written)} 个目录分片, 更新 {sum(written.values())} 个)', 'Sync-Index')
     except Exception as e:
         log_error(f'生成索引失败: {e}', 'Sync-Index')
 
-def main():
-    log_info('=' * 60, 'Sync')
-    log_info('开始同步', 'Sync')
-    log_info('=' * 60, 'Sync')
+def load_nav_root(index_file, root_name):
+    # 读取现有的根清单，格式或根目录与当前构建不一致时返回 None
+    try:
+        with open(index_file, 'r', encoding='utf-8') as f:
+            index = json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return None
+    if not isinstance(index, dict) or index.get('version') != NAV_VERSION:
+        return None
+    items = index.get('items', [])
+    if len(items) != 1 or items[0].get('name') != root_name:
+        return None
+    return items[0]
+
+def read_nav_shard(nav_file):
+    try:
+        with open(nav_file, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return []
+
+def patch_nav_index(source_dir, root_name, index_file, affected, versions):
+    """
+    只重写 affected(有文件变化的源目录及其全部上级目录，'' 为源目录本身)的目录分片：逐个列出这些目录，
+    未受影响的子目录沿用原分片中的存根，结果与 generate_index 全量生成的相同。返回重写或删除的分片文件
+    """
+    nav_dir = index_file.parent / 'nav'
+    nav_dir.mkdir(parents=True, exist_ok=True)
+    written = {}
     
-    root_dir = Path(__file__).parent.parent
-    source_dir_name = get_source_dir()
-    source_dir = root_dir / source_dir_name
-    docs_dir = get_docs_dir()
-    index_file = root_dir / 'reader' / 'index.json'
-    github_repo = get_github_repo()
-    
-    log_info(f'源目录: /{source_dir_name}/', 'Sync')
-    log_info(f'目标目录: {docs_dir}', 'Sync')
-    log_info(f'索引文件: {index_file}', 'Sync')
-    log_info(f'GitHub 仓库: {github_repo}', 'Sync')
-    log_info(f'时间: {datetime.now().strftime("%Y-%m-%d %H:%M:%S")}', 'Sync')
-    
-    if not source_dir.exists():
-        log_error(f'源目录不存在: /{source_dir_name}/', 'Sync')
+    def patch_folder(dir_path, rel_prefix, nav_rel, name):
+        nav_id = get_nav_id(nav_rel)
+        old_stubs = {entry['name']: entry for entry in read_nav_shard(nav_dir / f'{nav_id}.json')
+                     if entry['type'] == 'folder'}
+        dirs, records = list_directory(dir_path, rel_prefix, False) if dir_path.is_dir() else ([], [])
+        entries = []
+        total_files = 0
+        for child_name, child_rel, child_path in dirs:
+            if child_rel in affected:
+                stub = patch_folder(Path(child_path), child_rel + '/', f'{nav_rel}/{child_name}', child_name)
+            else:
+                stub = old_stubs.get(child_name)
+            if stub:
+                total_files += stub['files']
+                entries.append(stub)
+        for record in records:
+            if record['excluded']:
+                continue
+            item = make_nav_file_item(record)
+            version = versions.get(item['path'])
+            entries.append(dict(item, **version) if version else item)
+            total_files += 1
+        # 与 scan_directory 一致：没有文档的子目录不出现在目录索引中
+        if not entries and rel_prefix:
+            return None
+        content_hash, changed = write_nav_shard(nav_dir / f'{nav_id}.json', entries)
+        written[nav_id] = changed
+        return {'type': 'folder', 'name': name, 'id': nav_id, 'hash': content_hash, 'files': total_files}
+    
+    root_stub = patch_folder(Path(source_dir), '', root_name, root_name)
+    touched = [nav_dir / f'{nav_id}.json' for nav_id, changed in written.items() if changed]
+    for rel_dir in affected:
+        nav_id = get_nav_id(f'{root_name}/{rel_dir}' if rel_dir else root_name)
+        nav_file = nav_dir / f'{nav_id}.json'
+        if nav_id not in written and nav_file.exists():
+            nav_file.unlink()
+            touched.append(nav_file)
+    
+    write_output(index_file, json.dumps({'version': NAV_VERSION, 'items': [root_stub]},
+                                        ensure_ascii=False, separators=(',', ':')))
+    count_metric('nav.written', sum(written.values()))
+    count_metric('nav.unchanged', len(written) - sum(written.values()))
+    log_info(f'更新索引: {index_file} (重写 {sum(written.values())} 个目录分片, 删除 {len(touched) - sum(written.values())} 个)',
+             'Sync-Index')
+    return touched + [index_file]
+
+SEARCH_TOKEN_RE = re.compile(
+    r'(?P<cjk>[\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af\uf900-\ufaff]+)'
+    r'|(?P<word>[0-9A-Za-z\u00c0-\u024f]+)')
+HTML_TAG_RE = re.compile(r'<[^>]+>')
+
+def tokenize_text(lines, counts=None):
+    # CJK 连续字符切分为二元组(单字成词)，拉丁文字按单词切分并转为小写
+    if counts is None:
+        counts = Counter()
+    for line in lines:
+        for match in SEARCH_TOKEN_RE.finditer(line):
+            run = match.group()
+            if match.lastgroup == 'cjk':
+                if len(run) == 1:
+                    counts[run] += 1
+                else:
+                    counts.update(run[i:i + 2] for i in range(len(run) - 1))
+            elif 2 <= len(run) <= SEARCH_MAX_WORD_LENGTH:
+                counts[run.lower()] += 1
+    return counts
+
+def collect_terms(path, dest_path):
+    # TXT/MD 直接读取源文件，DOCX 从生成的 HTML 中去除标签后提取
+    if path.suffix == '.docx':
+        with open(dest_path, 'r', encoding='utf-8') as f:
+            lines = (unescape_html(HTML_TAG_RE.sub(' ', line)) for line in f)
+            return dict(tokenize_text(lines))
+    with open(path, 'r', encoding='utf-8') as f:
+        return dict(tokenize_text(f))
+
+def unescape_html(text):
+    return text.replace('&lt;', '<').replace('&gt;', '>').replace('&quot;', '"').replace('&amp;', '&')
+
+def get_search_shard(term):
+    # 按词项首字符分片：ASCII 字符各自一片，其余按码位高位分组，前端使用相同规则计算
+    first = term[0]
+    if first < '\x80':
+        return first
+    return 'u' + format(ord(first) >> SEARCH_SHARD_SHIFT, 'x')
+
+def load_search_cache():
+    cache_file = get_search_cache_file()
+    if not cache_file.exists():
+        return {}
+    try:
+        with open(cache_file, 'r', encoding='utf-8') as f:
+            cache = json.load(f)
+    except (json.JSONDecodeError, IOError) as e:
+        log_error(f'搜索缓存加载错误: {e}', 'Sync-Search')
+        return {}
+    # 分词规则随渲染代码一起变化，代码变化后缓存整体失效
+    if cache.get('version') != SEARCH_VERSION or cache.get('renderer') != get_renderer_fingerprint():
+        return {}
+    return cache.get('files', {})
+
+def save_search_cache(search_docs):
+    cache_file = get_search_cache_file()
+    tmp_file = cache_file.with_name(cache_file.name + '.tmp')
+    try:
+        # json.dumps 使用 C 编码器，json.dump 逐块写入时走纯 Python 实现
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            f.write(json.dumps({'version': SEARCH_VERSION, 'renderer': get_renderer_fingerprint(), 'files': search_docs},
+                               ensure_ascii=False, separators=(',', ':'), sort_keys=True))
+        os.replace(tmp_file, cache_file)
+    except Exception as e:
+        log_error(f'保存搜索缓存失败: {e}', 'Sync-Search')
+
+def load_search_meta(search_dir):
+    meta_file = search_dir / 'index.json'
+    if not meta_file.exists():
+        return {}
+    try:
+        with open(meta_file, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (json.JSONDecodeError, IOError):
+        return {}
+
+def write_if_changed(path, data, old_hash):
+    # 内容未变化的分片不重写，保持文件和缓存稳定
+    digest = hash_bytes(data)[:16]
+    if digest != old_hash or not path.exists():
+        tmp_file = path.with_name(path.name + '.tmp')
+        with open(tmp_file, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_file, path)
+        return digest, True
+    return digest, False
+
+def remove_search_index(search_dir):
+    # 关闭全文搜索时删除已生成的索引分片和分词缓存；阅读器请求不到 search/index.json 时只按标题搜索
+    cache_file = get_search_cache_file()
+    if not search_dir.exists() and not cache_file.exists():
         return
+    shutil.rmtree(search_dir, ignore_errors=True)
+    cache_file.unlink(missing_ok=True)
+    log_info(f'全文搜索已关闭，删除搜索索引和分词缓存: {search_dir}', 'Sync-Search')
+
+def build_search_index(search_docs, search_dir):
+    search_dir.mkdir(parents=True, exist_ok=True)
+    old_meta = load_search_meta(search_dir)
+    old_shards = old_meta.get('shards', {})
     
-    log_info('清理已删除的文件...', 'Sync')
-    cleanup_orphaned_files(source_dir, docs_dir)
+    # 文档编号跨构建保持稳定，新文档追加到末尾，空洞过多时重新编号
+    old_docs = []
+    docs_file = search_dir / 'docs.json'
+    if old_meta.get('version') == SEARCH_VERSION and docs_file.exists():
+        with open(docs_file, 'r', encoding='utf-8') as f:
+            old_docs = json.load(f)
+    doc_ids = {doc[0]: i for i, doc in enumerate(old_docs) if doc}
     
-    items = []
-    if source_dir.exists():
+    paths = {get_output_rel(rel_key): rel_key for rel_key in search_docs}
+    live_ids = [doc_ids[path] for path in paths if path in doc_ids]
+    if len(old_docs) > 2 * max(len(live_ids), 1):
+        doc_ids = {}
+        old_docs = []
+    
+    docs = [None] * len(old_docs)
+    for path in sorted(paths):
+        if path not in doc_ids:
+            doc_ids[path] = len(docs)
+            docs.append(None)
+        docs[doc_ids[path]] = [path, get_doc_title(paths[path].rpartition('/')[2])]
+    
+    shards = {}
+    for path, rel_key in paths.items():
+        doc_id = doc_ids[path]
+        for term, tf in search_docs[rel_key]['terms'].items():
+            shards.setdefault(get_search_shard(term), {}).setdefault(term, []).append((doc_id, tf))
+    
+    written = 0
+    shard_hashes = {}
+    for shard, terms in shards.items():
+        postings = {term: [n for doc_id, tf in sorted(entries) for n in (doc_id, tf)] for term, entries in terms.items()}
+        data = json.dumps(postings, ensure_ascii=False, separators=(',', ':'), sort_keys=True).encode('utf-8')
+        shard_hashes[shard], changed = write_if_changed(search_dir / f'{shard}.json', data, old_shards.get(shard))
+        written += changed
+    
+    for shard in old_shards.keys() - shards.keys():
+        (search_dir / f'{shard}.json').unlink(missing_ok=True)
+    
+    docs_data = json.dumps(docs, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    docs_hash, _ = write_if_changed(docs_file, docs_data, old_meta.get('docs'))
+    
+    meta = {
+        'version': SEARCH_VERSION,
+        'shift': SEARCH_SHARD_SHIFT,
+        'max_word_length': SEARCH_MAX_WORD_LENGTH,
+        'docs': docs_hash,
+        'shards': dict(sorted(shard_hashes.items()))
+    }
+    write_output(search_dir / 'index.json', json.dumps(meta, ensure_ascii=False, separators=(',', ':')))
+    count_metric('search_shard.written', written)
+    count_metric('search_shard.unchanged', len(shards) - written)
+    log_info(f'生成搜索索引: {len(paths)} 个文档, {len(shards)} 个分片, 更新 {written} 个分片', 'Sync-Search')
+
+def patch_search_index(search_docs, old_terms, search_dir):
+    """
+    old_terms 为本次变化的文档(rel_key)在变化前的分词结果，新文档为 None。只读取并重写包含这些文档
+    词项的分片，结果与 build_search_index 全量生成的相同。现有索引不可用、缺少旧分词结果或文档编号
+    需要整体重排时返回 None，由调用方全量生成；否则返回重写或删除的文件
+    """
+    old_meta = load_search_meta(search_dir)
+    docs_file = search_dir / 'docs.json'
+    if old_meta.get('version') != SEARCH_VERSION or not docs_file.exists():
+        return None
+    with open(docs_file, 'r', encoding='utf-8') as f:
+        docs = json.load(f)
+    doc_ids = {doc[0]: i for i, doc in enumerate(docs) if doc}
+    paths = {get_output_rel(rel_key): rel_key for rel_key in search_docs}
+    live_ids = [doc_ids[path] for path in paths if path in doc_ids]
+    if len(docs) > 2 * max(len(live_ids), 1):
+        return None
+    
+    affected = set()
+    changed_ids = set()
+    for rel_key, terms in old_terms.items():
+        path = get_output_rel(rel_key)
+        if path not in doc_ids:
+            continue
+        if terms is None:
+            return None
+        affected.update(get_search_shard(term) for term in terms)
+        changed_ids.add(doc_ids[path])
+        docs[doc_ids[path]] = None
+    
+    # 新文档按路径排序追加编号，与全量生成时的顺序相同
+    additions = {}
+    for path in sorted(get_output_rel(rel_key) for rel_key in old_terms if rel_key in search_docs):
+        if path not in doc_ids:
+            doc_ids[path] = len(docs)
+            docs.append(None)
+        doc_id = doc_ids[path]
+        changed_ids.add(doc_id)
+        docs[doc_id] = [path, get_doc_title(paths[path].rpartition('/')[2])]
+        for term, tf in search_docs[paths[path]]['terms'].items():
+            shard = get_search_shard(term)
+            affected.add(shard)
+            additions.setdefault(shard, []).append((term, doc_id, tf))
+    
+    shard_hashes = dict(old_meta.get('shards', {}))
+    touched = []
+    written = 0
+    for shard in sorted(affected):
+        shard_file = search_dir / f'{shard}.json'
+        postings = {}
+        if shard in shard_hashes:
+            with open(shard_file, 'r', encoding='utf-8') as f:
+                postings = json.load(f)
+        terms = {}
+        for term, flat in postings.items():
+            entries = [(flat[i], flat[i + 1]) for i in range(0, len(flat), 2) if flat[i] not in changed_ids]
+            if entries:
+                terms[term] = entries
+        for term, doc_id, tf in additions.get(shard, ()):
+            terms.setdefault(term, []).append((doc_id, tf))
+        touched.append(shard_file)
+        if not terms:
+            shard_file.unlink(missing_ok=True)
+            shard_hashes.pop(shard, None)
+            continue
+        postings = {term: [n for doc_id, tf in sorted(entries) for n in (doc_id, tf)] for term, entries in terms.items()}
+        data = json.dumps(postings, ensure_ascii=False, separators=(',', ':'), sort_keys=True).encode('utf-8')
+        shard_hashes[shard], changed = write_if_changed(shard_file, data, shard_hashes.get(shard))
+        written += changed
+    
+    docs_data = json.dumps(docs, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    docs_hash, _ = write_if_changed(docs_file, docs_data, old_meta.get('docs'))
+    meta = {
+        'version': SEARCH_VERSION,
+        'shift': SEARCH_SHARD_SHIFT,
+        'max_word_length': SEARCH_MAX_WORD_LENGTH,
+        'docs': docs_hash,
+        'shards': dict(sorted(shard_hashes.items()))
+    }
+    write_output(search_dir / 'index.json', json.dumps(meta, ensure_ascii=False, separators=(',', ':')))
+    count_metric('search_shard.written', written)
+    count_metric('search_shard.unchanged', len(affected) - written)
+    log_info(f'更新搜索索引: {len(old_terms)} 个文档变化, 检查 {len(affected)} 个分片, 更新 {written} 个分片', 'Sync-Search')
+    return touched + [docs_file, search_dir / 'index.json']
+
+def compress_asset(path):
+    # gzip 固定 mtime，保证相同内容产生相同的压缩文件
+    with open(path, 'rb') as f:
+        data = f.read()
+    outputs = [(path.with_name(path.name + '.gz'), gzip.compress(data, compresslevel=9, mtime=0))]
+    if brotli is not None:
+        outputs.append((path.with_name(path.name + '.br'), brotli.compress(data)))
+    for out_path, compressed in outputs:
+        tmp_file = out_path.with_name(out_path.name + '.tmp')
+        with open(tmp_file, 'wb') as f:
+            f.write(compressed)
+        os.replace(tmp_file, out_path)
+    return {out_path.suffix[1:]: len(compressed) for out_path, compressed in outputs}
+
+def iter_published_files(reader_dir):
+    for sub_dir in ('docs', 'nav', 'search'):
+        base = reader_dir / sub_dir
+        if base.exists():
+            yield from walk_files(base)
+    index_file = reader_dir / 'index.json'
+    if index_file.exists():
+        yield index_file
+
+def walk_files(dir_path):
+    with os.scandir(dir_path) as it:
+        for entry in it:
+            if entry.is_dir(follow_symlinks=False):
+                yield from walk_files(entry.path)
+            elif entry.is_file():
+                yield Path(entry.path)
+
+def publish_assets(reader_dir, jobs=1, paths=None):
+    # 为生成的 HTML/TXT/JSON 写出预压缩副本和内容指纹清单(assets.json)，只处理内容变化的文件。
+    # paths 为可能变化或已删除的文件，给出时只检查这些文件，其余条目沿用原清单
+    manifest_file = reader_dir / 'assets.json'
+    old_assets = {}
+    if manifest_file.exists():
+        try:
+            with open(manifest_file, 'r', encoding='utf-8') as f:
+                manifest = json.load(f)
+            if manifest.get('version') == ASSET_MANIFEST_VERSION:
+                old_assets = manifest.get('assets', {})
+        except (json.JSONDecodeError, IOError) as e:
+            log_error(f'资源清单加载错误: {e}', 'Sync-Publish')
+    
+    encodings = ['gz', 'br'] if brotli is not None else ['gz']
+    assets = {} if paths is None else dict(old_assets)
+    pending = []
+    removed = 0
+    checked = 0
+    for path in (iter_published_files(reader_dir) if paths is None else set(paths)):
+        if path.suffix in ('.gz', '.br'):
+            if not path.with_suffix('').exists():
+                path.unlink()
+                removed += 1
+            continue
+        if path.suffix not in COMPRESSIBLE_SUFFIXES:
+            continue
+        rel_key = path.relative_to(reader_dir).as_posix()
+        if paths is not None and not path.exists():
+            assets.pop(rel_key, None)
+            remove_compressed(path)
+            continue
+        checked += 1
+        entry = {'hash': hash_file(path)[:16], 'size': path.stat().st_size}
+        old_entry = old_assets.get(rel_key)
+        if (old_entry and old_entry.get('hash') == entry['hash']
+                and all(enc in old_entry for enc in encodings)
+                and all(path.with_name(f'{path.name}.{enc}').exists() for enc in encodings)):
+            entry.update({enc: old_entry[enc] for enc in encodings})
+        else:
+            pending.append((rel_key, path))
+        assets[rel_key] = entry
+    
+    if pending:
+        with ThreadPoolExecutor(max_workers=max(1, jobs)) as executor:
+            for (rel_key, _), sizes in zip(pending, executor.map(compress_asset, [path for _, path in pending])):
+                assets[rel_key].update(sizes)
+    
+    tmp_file = manifest_file.with_name(manifest_file.name + '.tmp')
+    with open(tmp_file, 'w', encoding='utf-8') as f:
+        json.dump({'version': ASSET_MANIFEST_VERSION, 'encodings': encodings, 'assets': dict(sorted(assets.items()))},
+                  f, ensure_ascii=False, separators=(',', ':'))
+    os.replace(tmp_file, manifest_file)
+    count_metric('precompress.hit', checked - len(pending))
+    count_metric('precompress.miss', len(pending))
+    log_info(f'预压缩完成: {len(assets)} 个文件, 压缩 {len(pending)} 个, 删除过期副本 {removed} 个 ({"/".join(encodings)})',
+             'Sync-Publish')
+
+def snapshot_inventory(inventory):
+    return {record['rel_key']: (record['stat'].st_mtime_ns, record['stat'].st_size, record['excluded'])
+            for record in inventory['files']}
+
+def start_observer(source_dir, event):
+    # 安装了 watchdog 时使用系统文件事件(inotify/FSEvents/ReadDirectoryChangesW)，否则返回 None 改为轮询
+    try:
+        from watchdog.observers import Observer
+        from watchdog.events import FileSystemEventHandler
+    except ImportError:
+        return None
+    
+    class ChangeHandler(FileSystemEventHandler):
+        def on_any_event(self, _event):
+            event.set()
+    
+    observer = Observer()
+    observer.schedule(ChangeHandler(), str(source_dir), recursive=True)
+    observer.daemon = True
+    observer.start()
+    return observer
+
+def wait_for_changes(source_dir, snapshot, observer, event, interval, debounce):
+    # 检测到变化后继续等待，直到 debounce 秒内没有新的变化，再返回新的清单
+    while True:
+        if observer is not None:
+            event.wait()
+            while True:
+                event.clear()
+                if not event.wait(debounce):
+                    break
+        else:
+            time.sleep(interval)
+        inventory = build_inventory(source_dir, verbose=False)
+        current = snapshot_inventory(inventory)
+        if current == snapshot:
+            continue
+        if observer is None:
+            while True:
+                time.sleep(debounce)
+                settled = build_inventory(source_dir, verbose=False)
+                settled_snapshot = snapshot_inventory(settled)
+                if settled_snapshot == current:
+                    break
+                inventory, current = settled, settled_snapshot
+        return inventory, current
+
+def remove_compressed(dest_path):
+    for suffix in ('.gz', '.br'):
+        dest_path.with_name(dest_path.name + suffix).unlink(missing_ok=True)
+
+def remove_output(dest_dir, output_rel):
+    # 删除输出文件及其预压缩副本，并向上删除变空的目录
+    dest_path = dest_dir / output_rel
+    dest_path.unlink(missing_ok=True)
+    remove_compressed(dest_path)
+    shutil.rmtree(get_segment_dir(dest_path), ignore_errors=True)
+    for sidecar in (get_outline_file(dest_path), get_tables_file(dest_path)):
+        sidecar.unlink(missing_ok=True)
+        remove_compressed(sidecar)
+    parent = dest_path.parent
+    while parent != dest_dir and parent.exists() and not any(parent.iterdir()):
+        parent.rmdir()
+        parent = parent.parent
+
+def get_dirty_folders(root_name, rel_keys):
+    # 变化文件的所有祖先目录，对应需要重写的目录分片
+    dirty = {root_name}
+    for rel_key in rel_keys:
+        parts = rel_key.split('/')[:-1]
+        for i in range(1, len(parts) + 1):
+            dirty.add('/'.join([root_name] + parts[:i]))
+    return dirty
+
+def serve_reader(reader_dir, port):
+    # 只有监听模式用到，按需导入以缩短普通构建的启动时间
+    from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+    
+    class QuietHandler(SimpleHTTPRequestHandler):
+        def log_message(self, format, *args):
+            pass
+    
+    server = ThreadingHTTPServer(('127.0.0.1', port), partial(QuietHandler, directory=str(reader_dir)))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    log_info(f'本地预览: http://127.0.0.1:{port}/', 'Sync-Watch')
+    return server
+
+def raise_interrupt(signum, frame):
+    raise KeyboardInterrupt
+
+def watch_source(state, jobs, interval, debounce, get_executor=None):
+    # 监听源目录：合并去抖窗口内的变化，只转换变化的文件、只重写受影响的目录分片。
+    # 目录和文档更新后再刷新全文索引，搜索结果可能比页面稍晚更新
+    source_dir = state['source_dir']
+    docs_dir = state['docs_dir']
+    snapshot = snapshot_inventory(state['inventory'])
+    event = threading.Event()
+    observer = start_observer(source_dir, event)
+    log_info(f'监听源目录: {source_dir} ({"文件系统事件" if observer else f"轮询, 间隔 {interval}s"}, 去抖 {debounce}s)',
+             'Sync-Watch')
+    # 进程管理器和容器停止时发送 SIGTERM：与 Ctrl+C 一样结束监听，保存清单和分词缓存
+    previous_handler = None
+    if threading.current_thread() is threading.main_thread():
+        previous_handler = signal.signal(signal.SIGTERM, raise_interrupt)
+    try:
+        while True:
+            inventory, current = wait_for_changes(source_dir, snapshot, observer, event, interval, debounce)
+            start = time.perf_counter()
+            changed = {rel_key for rel_key in snapshot.keys() | current.keys()
+                       if snapshot.get(rel_key) != current.get(rel_key)}
+            snapshot = current
+            log_info(f'检测到 {len(changed)} 个文件变化', 'Sync-Watch')
+            
+            # 监听模式不做预压缩，变化文件的旧压缩副本直接删除，下次完整同步时重新生成
+            for rel_key in changed:
+                if not rel_key.endswith(tuple(ALLOWED_EXTENSIONS)):
+                    continue
+                output_rel = get_output_rel(rel_key)
+                if rel_key not in current or current[rel_key][2]:
+                    remove_output(docs_dir, output_rel)
+                    log_detail(f'删除: {output_rel}', 'Sync-Watch')
+                else:
+                    remove_compressed(docs_dir / output_rel)
+                    remove_compressed(get_outline_file(docs_dir / output_rel))
+                    remove_compressed(get_tables_file(docs_dir / output_rel))
+            
+            items = [{'type': 'folder', 'name': state['source_dir_name'], 'children': scan_directory(inventory)}]
+            state['manifest'], state['search_docs'] = copy_and_convert_files(
+                inventory, docs_dir, jobs, changed, (state['manifest'], state['search_docs']), get_executor)
+            generate_index(items, state['index_file'], get_nav_versions(state['manifest']), state['nav_cache'],
+                           get_dirty_folders(state['source_dir_name'], changed))
+            log_info(f'更新完成，耗时 {time.perf_counter() - start:.2f}s', 'Sync-Watch')
+            
+            if state['search_docs'] is not None:
+                build_search_index(state['search_docs'], get_search_dir())
+            state['inventory'] = inventory
+    except KeyboardInterrupt:
+        log_info('停止监听', 'Sync-Watch')
+    finally:
+        if previous_handler is not None:
+            signal.signal(signal.SIGTERM, previous_handler)
+        if observer is not None:
+            observer.stop()
+        save_manifest(state['manifest'])
+        if state['search_docs'] is not None:
+            save_search_cache(state['search_docs'])
+
+def unquote_git_path(path):
+    # git 默认(core.quotepath)为含非 ASCII 或特殊字符的路径加引号，并把每个字节转义为 \ooo
+    if len(path) < 2 or not (path.startswith('"') and path.endswith('"')):
+        return path
+    def unescape(match):
+        code = match.group(1)
+        return bytes([int(code, 8) if len(code) == 3 else GIT_ESCAPES.get(code, code[0])])
+    return GIT_ESCAPE_RE.sub(unescape, path[1:-1].encode('utf-8')).decode('utf-8')
+
+def read_changed_paths(lines, root_dir, source_dir):
+    """
+    解析变化路径列表：每行一个相对 root_dir 的路径(或绝对路径)，也可以直接使用 git diff --name-status 的输出
+    (状态<TAB>路径，重命名和复制为 状态<TAB>旧路径<TAB>新路径)。新增、修改、删除和重命名不需要区分，
+    按文件当前是否存在处理。逐个返回源目录内的相对路径(重复的只返回一次)，源目录之外的路径被忽略。
+    lines 可以是逐行产生的迭代器，例如流水线模式下随下载完成写入的队列
+    """
+    rel_keys = set()
+    for line in lines:
+        line = line.rstrip('\r\n')
+        if not line.strip():
+            continue
+        fields = line.split('\t')
+        if len(fields) > 1 and GIT_STATUS_RE.fullmatch(fields[0]):
+            fields = fields[1:]
+        for field in fields:
+            rel = os.path.relpath(os.path.join(root_dir, unquote_git_path(field)), source_dir)
+            if rel == '.' or rel == '..' or rel.startswith('..' + os.sep):
+                continue
+            rel_key = Path(rel).as_posix()
+            if rel_key not in rel_keys:
+                rel_keys.add(rel_key)
+                yield rel_key
+
+def get_parent_dirs(rel_key):
+    # 源文件所在目录及其全部上级目录，'' 为源目录本身
+    parts = rel_key.split('/')[:-1]
+    return ['/'.join(parts[:i]) for i in range(len(parts) + 1)]
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='TXT/MD/DOCX 文件同步脚本')
+    parser.add_argument('-j', '--jobs', type=int, default=1,
+                        help='MD/DOCX 转换使用的进程数，0 表示使用全部 CPU 核心（默认 1，串行）')
+    parser.add_argument('--watch', action='store_true',
+                        help='同步完成后监听源目录，增量转换变化的文件并在本地提供 reader/ 预览')
+    parser.add_argument('--port', type=int, default=8000, help='监听模式下本地预览服务的端口，0 表示不启动（默认 8000）')
+    parser.add_argument('--interval', type=float, default=0.5, help='未安装 watchdog 时的轮询间隔秒数（默认 0.5）')
+    parser.add_argument('--debounce', type=float, default=0.2, help='合并文件变化的去抖窗口秒数（默认 0.2）')
+    parser.add_argument('-q', '--quiet', action='store_true', help='只输出阶段汇总和错误，不输出逐文件日志')
+    parser.add_argument('--metrics', default=None,
+                        help='将各阶段耗时、逐文件转换耗时和字节数、缓存命中情况写入该 JSON 文件')
+    parser.add_argument('--slowest', type=int, default=10, help='汇总中列出的最慢文档数（默认 10）')
+    parser.add_argument('--changed', default=None,
+                        help='只同步该文件中列出的变化路径(每行一个，或 git diff --name-status 的输出)，- 表示从标准输入读取')
+    args = parser.parse_args(argv)
+    if args.changed is not None and args.watch:
+        parser.error('--changed 不能与 --watch 同时使用')
+    return args
+
+class Builder:
+    """
+    进程内构建接口：配置和目录在每次 build 时显式传入，不依赖脚本所在位置和 reader/config.json。
+    一个长期运行的进程可以用同一个 Builder 依次构建多个站点，共用进程池和转换结果缓存
+    (不同站点中内容相同的文档只转换一次)。当前站点保存在模块级状态中，同一进程内的构建需依次执行
+    """
+    
+    def __init__(self, jobs=1):
+        self.jobs = jobs if jobs > 0 else (os.cpu_count() or 1)
+        self.executor = None
+        self.conversions = {}
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc_info):
+        self.close()
+    
+    def get_executor(self):
+        # 进程池在第一次需要时创建；工作进程按需启动，之后的站点直接复用。
+        # 工作进程异常退出后进程池不可再用，关闭后重新创建，不影响之后的构建
+        if self.executor is not None and self.executor._broken:
+            log_error('进程池已损坏，重新创建', 'Sync-Core')
+            self.executor.shutdown(wait=False)
+            self.executor = None
+        if self.executor is None and self.jobs > 1:
+            self.executor = ProcessPoolExecutor(max_workers=self.jobs)
+        return self.executor
+    
+    def close(self):
+        if self.executor is not None:
+            self.executor.shutdown()
+            self.executor = None
+    
+    def build(self, config, reader_dir, source_dir=None, root_dir=None, nav_cache=None, changed=None):
+        """
+        config 为配置字典或配置文件路径。root_dir 存放构建清单和搜索缓存，默认为 reader_dir 的上级目录；
+        source_dir 默认为 root_dir 下的 config['source_dir']。changed 为变化路径列表(见 read_changed_paths)
+        或逐行产生的迭代器，给出时只处理这些文件，无法增量处理时读完 changed 后回退为全量构建。
+        返回构建状态(全量构建的结果可交给 watch_source)，源目录不存在时返回 None
+        """
+        if not isinstance(config, dict):
+            config = read_config(config) or {}
+        reader_dir = Path(reader_dir)
+        root_dir = Path(root_dir) if root_dir is not None else reader_dir.parent
+        source_dir_name = config.get('source_dir', '')
+        source_dir = Path(source_dir) if source_dir is not None else root_dir / source_dir_name
+        source_dir_name = source_dir_name or source_dir.name
+        use_site(config, root_dir, reader_dir)
+        reset_metrics()
+        
+        docs_dir = get_docs_dir()
+        index_file = reader_dir / 'index.json'
+        log_info(f'源目录: /{source_dir_name}/', 'Sync')
+        log_info(f'目标目录: {docs_dir}', 'Sync')
+        log_info(f'索引文件: {index_file}', 'Sync')
+        log_info(f'GitHub 仓库: {get_github_repo()}', 'Sync')
+        log_info(f'时间: {datetime.now().strftime("%Y-%m-%d %H:%M:%S")}', 'Sync')
+        
+        # 定向同步不要求源目录已存在：流水线模式下源文件随下载逐个写入
+        if changed is not None:
+            state = self.build_changed(read_changed_paths(changed, root_dir, source_dir), source_dir,
+                                       source_dir_name, reader_dir)
+            if state is not None:
+                return state
+            log_info('改为全量构建', 'Sync-Targeted')
+            # 流水线模式下 changed 随下载逐行产生，读完即下载结束，之后才能遍历源目录
+            for _ in changed:
+                pass
+        
+        if not source_dir.exists():
+            log_error(f'源目录不存在: /{source_dir_name}/', 'Sync')
+            return None
+        
+        log_info('遍历源目录...', 'Sync')
+        with measure_stage('build_inventory'):
+            inventory = build_inventory(source_dir)
+        log_info(f'遍历完成，共 {len(inventory["files"])} 个文件', 'Sync')
+        
+        log_info('清理已删除的文件...', 'Sync')
+        with measure_stage('cleanup_orphaned_files'):
+            cleanup_orphaned_files(inventory, docs_dir)
+        
         log_info('扫描目录结构...', 'Sync')
-        items = [{
-            'type': 'folder',
-            'name': source_dir_name,
-            'children': scan_directory(source_dir, source_dir)
-        }]
+        with measure_stage('scan_directory'):
+            items = [{
+                'type': 'folder',
+                'name': source_dir_name,
+                'children': scan_directory(inventory)
+            }]
         log_info(f'扫描完成，共 {len(items[0]["children"])} 个项目', 'Sync')
+        
+        log_info('复制和转换文件...', 'Sync')
+        with measure_stage('copy_and_convert_files'):
+            build_manifest, search_docs = copy_and_convert_files(
+                inventory, docs_dir, self.jobs, get_executor=self.get_executor, conversions=self.conversions)
+        with measure_stage('prune_orphaned_assets'):
+            prune_orphaned_assets(build_manifest)
+        
+        if search_docs is not None:
+            log_info('生成搜索索引...', 'Sync')
+            with measure_stage('build_search_index'):
+                build_search_index(search_docs, get_search_dir())
+        else:
+            remove_search_index(get_search_dir())
+        
+        log_info('生成索引文件...', 'Sync')
+        with measure_stage('generate_index'):
+            generate_index(items, index_file, get_nav_versions(build_manifest), nav_cache)
+        
+        if get_precompress():
+            log_info('生成预压缩文件...', 'Sync')
+            with measure_stage('publish_assets'):
+                publish_assets(reader_dir, self.jobs)
+        
+        return {
+            'source_dir': source_dir,
+            'source_dir_name': source_dir_name,
+            'docs_dir': docs_dir,
+            'index_file': index_file,
+            'inventory': inventory,
+            'manifest': build_manifest,
+            'search_docs': search_docs,
+            'nav_cache': nav_cache
+        }
     
-    log_info('复制和转换文件...', 'Sync')
-    copy_and_convert_files(source_dir, docs_dir)
-    
-    log_info('生成索引文件...', 'Sync')
-    generate_index(items, index_file)
+    def build_changed(self, rel_keys, source_dir, source_dir_name, reader_dir):
+        """
+        定向同步：只转换或删除 rel_keys 中的文件，只重写受影响的目录分片、搜索分片和预压缩副本，
+        不遍历整个源目录。rel_keys 可以是生成器，路径到达时立即处理，转换与路径的产生(如下载)重叠进行。
+        构建清单、分词缓存或目录索引不可用，或配置、渲染代码已变化时返回 None(此时尚未读取 rel_keys)
+        """
+        docs_dir = get_docs_dir()
+        index_file = reader_dir / 'index.json'
+        manifest = load_manifest()
+        if not manifest:
+            log_info('没有可用的构建清单', 'Sync-Targeted')
+            return None
+        config_fp = get_config_fingerprint()
+        if any(entry.get('config') != config_fp or entry.get('converter') != get_converter_version(Path(rel_key).suffix)
+               for rel_key, entry in manifest.items()):
+            log_info('配置或渲染代码已变化', 'Sync-Targeted')
+            return None
+        index_terms = get_full_text_search()
+        search_cache = load_search_cache() if index_terms else None
+        if index_terms and not manifest.keys() <= search_cache.keys():
+            log_info('分词缓存不完整', 'Sync-Targeted')
+            return None
+        if load_nav_root(index_file, source_dir_name) is None:
+            log_info('目录索引不存在或格式不匹配', 'Sync-Targeted')
+            return None
+        
+        log_info('定向同步: 逐个处理变化路径', 'Sync-Targeted')
+        touched_keys = set()
+        old_entries = {}
+        old_terms = {} if index_terms else None
+        removed = 0
+        
+        def iter_records():
+            # 每个路径到达时立即删除输出或交给 copy_and_convert_files 转换，不等待整个列表
+            nonlocal removed
+            for rel_key in rel_keys:
+                record = get_source_record(source_dir, rel_key)
+                exists = record is not None and not record['excluded']
+                if not exists and rel_key not in manifest:
+                    continue
+                touched_keys.add(rel_key)
+                if rel_key in manifest:
+                    old_entries[rel_key] = manifest[rel_key]
+                if index_terms:
+                    old_terms[rel_key] = search_cache[rel_key]['terms'] if rel_key in search_cache else None
+                if exists:
+                    yield record
+                    continue
+                remove_output(docs_dir, manifest.pop(rel_key)['output'])
+                if index_terms:
+                    search_cache.pop(rel_key, None)
+                log_detail(f'删除: {rel_key}', 'Sync-Targeted')
+                removed += 1
+        
+        with measure_stage('copy_and_convert_files'):
+            new_entries, new_docs = copy_and_convert_files(
+                {'files': iter_records()}, docs_dir, self.jobs, touched_keys, (manifest, search_cache),
+                self.get_executor, self.conversions)
+            # 转换失败的文件与全量构建一样不保留条目
+            for rel_key in touched_keys:
+                manifest.pop(rel_key, None)
+                if index_terms:
+                    search_cache.pop(rel_key, None)
+            manifest.update(new_entries)
+            if index_terms:
+                search_cache.update(new_docs)
+            save_manifest(manifest)
+            if index_terms:
+                save_search_cache(search_cache)
+        log_info(f'定向同步: {len(touched_keys)} 个文件变化, 其中删除 {removed} 个', 'Sync-Targeted')
+        with measure_stage('prune_orphaned_assets'):
+            prune_orphaned_assets(manifest, [name for entry in old_entries.values() for name in entry.get('assets', ())])
+        
+        touched = []
+        for rel_key in touched_keys:
+            for entry in (old_entries.get(rel_key), manifest.get(rel_key)):
+                if entry is None:
+                    continue
+                dest_path = docs_dir / entry['output']
+                touched += [dest_path, get_outline_file(dest_path), get_tables_file(dest_path)]
+                touched += [dest_path.parent / name for name in entry.get('segments', ())]
+        
+        if index_terms:
+            with measure_stage('build_search_index'):
+                search_dir = get_search_dir()
+                search_touched = patch_search_index(search_cache, old_terms, search_dir)
+                if search_touched is None:
+                    build_search_index(search_cache, search_dir)
+                    search_touched = list(walk_files(search_dir))
+                touched += search_touched
+        
+        with measure_stage('generate_index'):
+            affected = {rel_dir for rel_key in touched_keys for rel_dir in get_parent_dirs(rel_key)}
+            touched += patch_nav_index(source_dir, source_dir_name, index_file, affected, get_nav_versions(manifest))
+        
+        if get_precompress():
+            with measure_stage('publish_assets'):
+                publish_assets(reader_dir, self.jobs, touched)
+        
+        return {
+            'source_dir': source_dir,
+            'source_dir_name': source_dir_name,
+            'docs_dir': docs_dir,
+            'index_file': index_file,
+            'inventory': None,
+            'manifest': manifest,
+            'search_docs': search_cache,
+            'nav_cache': None
+        }
+
+def main(argv=None):
+    args = parse_args(argv)
+    set_quiet(args.quiet)
     
     log_info('=' * 60, 'Sync')
-    log_info('同步完成！', 'Sync')
+    log_info('开始同步', 'Sync')
     log_info('=' * 60, 'Sync')
+    
+    changed = None
+    if args.changed == '-':
+        changed = sys.stdin.read().splitlines()
+    elif args.changed is not None:
+        with open(args.changed, 'r', encoding='utf-8') as f:
+            changed = f.read().splitlines()
+    
+    with Builder(args.jobs) as builder:
+        reader_dir = ROOT_DIR / 'reader'
+        state = builder.build(load_config(), reader_dir, root_dir=ROOT_DIR, nav_cache={} if args.watch else None,
+                              changed=changed)
+        if state is None:
+            return
+        
+        log_metrics_summary(args.slowest)
+        if args.metrics:
+            write_metrics(args.metrics, args.slowest)
+        
+        log_info('=' * 60, 'Sync')
+        log_info('同步完成！', 'Sync')
+        log_info('=' * 60, 'Sync')
+        sys.stdout.flush()
+        
+        if args.watch:
+            if args.port:
+                serve_reader(reader_dir, args.port)
+            watch_source(state, builder.jobs, args.interval, args.debounce, builder.get_executor)
 
 if __name__ == '__main__':
     main()